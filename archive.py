@@ -0,0 +1,287 @@
+import glob
+import hashlib
+import json
+import mmap
+import os
+import sys
+import threading
+import time
+import zlib
+from fnmatch import fnmatch
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+from http_cache import atomic_write
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 抓下来的原始页面不再一页一个 .html，而是压缩后追加进页面目录下的 pages.pack，
+# pages.idx 每行记录一个快照的 key、偏移和长度；同一页内容没变就不再存
+use_archive = True
+packname = "pages.pack"
+indexname = "pages.idx"
+lockname = "pages.lock"
+level = 9
+
+
+def compress(data: bytes) -> tuple:
+    # 装了 zstandard 用 zstd，否则用标准库的 zlib；编码方式记在索引里，混用也能读
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=level).compress(data)
+    return "zlib", zlib.compress(data, level)
+
+
+def decompress(codec: str, data) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+class FileLock:
+    # 进程间的排他锁：POSIX 用 flock，Windows 锁住锁文件的第一个字节
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        if self.file is None:
+            self.file = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        else:
+            self.file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK 重试 10 秒后放弃，继续等
+                    pass
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class PageArchive:
+    # 只追加的页面归档：读取通过 mmap 直接切片解压，不先读成字符串
+    # 写入由线程锁加文件锁串行化，多个进程（比如分布式 worker）可以写同一个归档
+    def __init__(self, root: str):
+        self.root = root
+        self.pack_path = os.path.join(root, packname)
+        self.index_path = os.path.join(root, indexname)
+        self.entries = {}
+        self.indexed = 0
+        self.lock = threading.Lock()
+        self.file_lock = FileLock(os.path.join(root, lockname))
+        self.map = None
+        self.pack = None
+        self.index = None
+        self.refresh()
+
+    def refresh(self) -> bool:
+        # 读入别的进程追加的索引行，返回末尾是否有写了一半的行
+        if not os.path.exists(self.index_path):
+            return False
+        with open(self.index_path, "rb") as f:
+            f.seek(self.indexed)
+            tail = f.read()
+        lines = tail.split(b"\n")
+        for line in lines[:-1]:
+            self.indexed += len(line) + 1
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # 写索引时挂掉留下的半行，后面的行还能用
+                continue
+            self.entries.setdefault(entry["key"], []).append(entry)
+        return lines[-1] != b""
+
+    def __contains__(self, key: str) -> bool:
+        if key not in self.entries:
+            with self.lock:
+                self.refresh()
+        return key in self.entries
+
+    def keys(self) -> list:
+        return list(self.entries)
+
+    def history(self, key: str) -> list:
+        return list(self.entries.get(key, ()))
+
+    def put(self, key: str, data: bytes) -> bool:
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            if self.pack is None:
+                os.makedirs(self.root, exist_ok=True)
+                self.pack = open(self.pack_path, "ab")
+                self.index = open(self.index_path, "a", encoding="utf-8")
+            with self.file_lock:
+                return self._append(key, data, digest)
+
+    def _append(self, key: str, data: bytes, digest: str) -> bool:
+        # 拿着文件锁：先读入别的进程新写的索引，再判断重复、追加数据和索引
+        if self.refresh():
+            # 半行是持锁写入时挂掉留下的，换行隔开，免得和下一行粘在一起
+            self.index.write("\n")
+            self.index.flush()
+            self.refresh()
+        latest = self.entries.get(key)
+        if latest and latest[-1]["sha256"] == digest:
+            return False
+
+        codec, blob = compress(data)
+        offset = self.pack.seek(0, os.SEEK_END)
+        self.pack.write(blob)
+        self.pack.flush()
+        # 先落数据再写索引，中途挂掉只会在 pack 末尾留下没人引用的字节
+        entry = {
+            "key": key,
+            "offset": offset,
+            "length": len(blob),
+            "codec": codec,
+            "size": len(data),
+            "sha256": digest,
+            "time": time.time(),
+        }
+        self.index.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.index.flush()
+        # 自己写的这行也按正常的索引行读进来，读取位置跟着前移
+        self.refresh()
+        return True
+
+    def _view(self, entry: dict) -> memoryview:
+        end = entry["offset"] + entry["length"]
+        with self.lock:
+            if self.map is None or len(self.map) < end:
+                # pack 追加后变长了，重新映射；旧映射等正在读的切片释放后自动回收
+                with open(self.pack_path, "rb") as f:
+                    self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return memoryview(self.map)[entry["offset"] : end]
+
+    def get(self, key: str, snapshot: int = -1) -> bytes:
+        entry = self.entries[key][snapshot]
+        view = self._view(entry)
+        try:
+            return decompress(entry["codec"], view)
+        finally:
+            view.release()
+
+    def close(self) -> None:
+        with self.lock:
+            for f in (self.pack, self.index):
+                if f is not None:
+                    f.close()
+            self.pack = self.index = None
+            self.file_lock.close()
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+def open_archive(root: str) -> PageArchive:
+    # 每个进程每个目录只打开一次
+    root = os.path.normpath(root)
+    with _archives_lock:
+        if root not in _archives:
+            _archives[root] = PageArchive(root)
+        return _archives[root]
+
+
+def store_page(path: str, data: bytes) -> None:
+    # path 还是原来的 tmp-xxx/xxx.html，归档按目录和文件名定位
+    if not use_archive:
+        atomic_write(path, data)
+        return
+    open_archive(os.path.dirname(path)).put(os.path.basename(path), data)
+
+
+def page_exists(path: str) -> bool:
+    return os.path.basename(path) in open_archive(os.path.dirname(path)) or (
+        os.path.exists(path)
+    )
+
+
+def read_page(path: str) -> str:
+    # 归档里有就从归档读，旧的 .html 文件也还能读
+    archive = open_archive(os.path.dirname(path))
+    if os.path.basename(path) in archive:
+        return archive.get(os.path.basename(path)).decode("utf-8")
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def page_bytes(path: str) -> bytes:
+    archive = open_archive(os.path.dirname(path))
+    if os.path.basename(path) in archive:
+        return archive.get(os.path.basename(path))
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def page_digest(path: str) -> str:
+    # 页面最新一版内容的 sha256，没存过返回 None；归档里的直接取索引，不用解压
+    archive = open_archive(os.path.dirname(path))
+    if os.path.basename(path) in archive:
+        return archive.history(os.path.basename(path))[-1]["sha256"]
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    return None
+
+
+def glob_pages(pattern: str) -> list:
+    archive = open_archive(os.path.dirname(pattern))
+    archived = [
+        os.path.join(os.path.dirname(pattern), key)
+        for key in archive.keys()
+        if fnmatch(key, os.path.basename(pattern))
+    ]
+    return sorted(set(glob.glob(pattern)) | set(archived))
+
+
+def migrate(root: str, remove: bool = False) -> int:
+    # 把目录里现有的 .html 收进归档
+    archive = open_archive(root)
+    count = 0
+    for path in sorted(glob.glob(os.path.join(root, "*.html"))):
+        with open(path, "rb") as f:
+            archive.put(os.path.basename(path), f.read())
+        count += 1
+        if remove:
+            os.remove(path)
+    return count
+
+
+if __name__ == "__main__":
+    # 用法：python archive.py tmp-cannes tmp-oscars [--remove]
+    remove = "--remove" in sys.argv
+    for root in [arg for arg in sys.argv[1:] if arg != "--remove"]:
+        before = sum(
+            os.path.getsize(p) for p in glob.glob(os.path.join(root, "*.html"))
+        )
+        count = migrate(root, remove)
+        after = os.path.getsize(os.path.join(root, packname)) if count else 0
+        print(f"{root}: {count} pages archived, {before} -> {after} bytes")
@@ -1,56 +1,88 @@
 import os
 import re
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
 import concurrent.futures
 
-headers = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36"
-}
+from archive import read_page
+from checkpoint import Journal
+from database import Sink
+from executors import make_executor
+from exporters import open_writer
+from http_client import get_client
+from media import MediaStore
+from parse_cache import cached_parse
+from parsers import make_soup
+from records import CannesAward, CannesSelection, Table
 
 tmpdir = "tmp-cannes"
 awards_base_url = "https://www.festival-cannes.com/en/retrospective/{year}/awards/"
 select_base_url = "https://www.festival-cannes.com/en/retrospective/{year}/selection/"
 
+page_urls = {"awards": awards_base_url, "selection": select_base_url}
+
 start_year = 1946
+end_year = 2024
 except_years = [1948, 1950]  # 1948, 1950年因为财政问题没有举办
 
 filename = "cannes-festival"
 
+# 抓取线程数，实际同时在途的请求数由 http_client 按站点的响应情况自适应调整
+workers = 8
+
+# 把封面、海报等图片镜像到本地 media/ 目录
+mirror_media = False
+
+# 同时把结果 upsert 进 SQLite（crawlers.db），按届次、单元、顺序原地更新
+use_sqlite = False
+
+# 解析方式：thread、process 或 inline，解析是 CPU 密集的，默认用多进程
+parse_executor = "process"
+
+
+def page_path(year: int, kind: str) -> str:
+    return f"./{tmpdir}/cannes-of-{year}-{kind}.html"
+
 
-def fetch_save_content(end_year):
+def fetch_page(year: int, kind: str) -> None:
+    target_url = page_urls[kind].format(year=year)
+    # 退避重试、Retry-After 和熔断由 http_client 统一处理
+    # 原文只压缩存进页面归档，HTTP 缓存只留校验信息，没变的页面服务器回 304
+    response = get_client().get(target_url, archive=page_path(year, kind))
+    response.raise_for_status()
+
+    print(f"Successfully fetch {target_url}")
+
+
+def fetch_save_content(end_year, workers: int = workers, journal: Journal = None):
     os.makedirs(tmpdir, exist_ok=True)
 
-    while end_year >= start_year:
-        if end_year in [1948, 1950]:
-            continue
-        target_url = awards_base_url.format(year=end_year)
-        response = requests.get(target_url, headers=headers)
-        response.raise_for_status()
-        with open(
-            f"./{tmpdir}/cannes-of-{end_year}-awards.html", "w", encoding="utf-8"
-        ) as f:
-            f.write(response.text)
-            print(f"Successfully fetch {target_url}")
-
-        target_url = select_base_url.format(year=end_year)
-        response = requests.get(target_url, headers=headers)
-        response.raise_for_status()
-        with open(
-            f"./{tmpdir}/cannes-of-{end_year}-selection.html", "w", encoding="utf-8"
-        ) as f:
-            f.write(response.text)
-            print(f"Successfully fetch {target_url}")
-        end_year -= 1
-
-
-def parse_selection(year, edition, content: str) -> list:
-    data = []
+    # 日志里记着的页面上次已经抓完落盘，重跑时跳过
+    jobs = [
+        (year, kind)
+        for year in range(end_year, start_year - 1, -1)
+        if year not in except_years
+        for kind in page_urls
+        if journal is None or f"{year}-{kind}" not in journal
+    ]
+
+    def fetch(year: int, kind: str) -> None:
+        fetch_page(year, kind)
+        if journal is not None:
+            journal.record(f"{year}-{kind}")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(fetch, year, kind) for year, kind in jobs]
+        # 等所有页面都结束再抛出第一个错误，成功的页面都能记进日志
+        concurrent.futures.wait(futures)
+        for future in futures:
+            future.result()
+
+
+def parse_selection(year, edition, content: str, parser: str = None) -> Table:
+    data = Table(CannesSelection)
 
     # print(f"\033[34mWelcome to the {year} - {edition}th Cannes Festival!\033[0m")
 
-    soup = BeautifulSoup(content, "html.parser")
+    soup = make_soup(content, parser)
     sections = soup.select("main .section", recursive=False)
     for section in sections:
         inner = section.select_one(".container__inner")
@@ -79,24 +111,22 @@ def parse_selection(year, edition, content: str) -> list:
                 )
 
             data.append(
-                {
-                    "year": year,
-                    "edition": edition,
-                    "title": title,
-                    "part1": part1,
-                    "part2": part2,
-                    "cannes_link": cannes_link,
-                    "img": img,
-                }
+                year=year,
+                edition=edition,
+                title=title,
+                part1=part1,
+                part2=part2,
+                cannes_link=cannes_link,
+                img=img,
             )
 
     return data
 
 
-def parse_awards(year, edition, content: str) -> list:
-    data = []
+def parse_awards(year, edition, content: str, parser: str = None) -> Table:
+    data = Table(CannesAward)
 
-    soup = BeautifulSoup(content, "html.parser")
+    soup = make_soup(content, parser)
     sections = soup.select("main .section", recursive=False)
     for section in sections:
         inner = section.select_one(".container__inner")
@@ -126,16 +156,14 @@ def parse_awards(year, edition, content: str) -> list:
                 )
 
             data.append(
-                {
-                    "year": year,
-                    "edition": edition,
-                    "title": title,
-                    "part1": part1,
-                    "part2": part2,
-                    "award": award,
-                    "cannes_link": cannes_link,
-                    "img": img,
-                }
+                year=year,
+                edition=edition,
+                title=title,
+                part1=part1,
+                part2=part2,
+                award=award,
+                cannes_link=cannes_link,
+                img=img,
             )
 
             print(
@@ -144,56 +172,68 @@ def parse_awards(year, edition, content: str) -> list:
     return data
 
 
-def fetch_and_parse(end_year):
-    with open(
-        f"./{tmpdir}/cannes-of-{end_year}-awards.html", "r", encoding="utf-8"
-    ) as f:
-        content = f.read()
-    awards = parse_awards(end_year, end_year - start_year + 1, content)
-
-    with open(
-        f"./{tmpdir}/cannes-of-{end_year}-selection.html", "r", encoding="utf-8"
-    ) as f:
-        content = f.read()
-    selection = parse_selection(end_year, end_year - start_year + 1, content)
-
-    return awards, selection
-
-
-def main():
-    # fetch_save_content(1961)
-
-    selection_of_all_year = []
-    awards_of_all_year = []
-
-    end_year = 2024
-
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(fetch_and_parse, year)
-            for year in range(start_year, end_year + 1)
-            if year not in except_years
-        ]
-        for future in concurrent.futures.as_completed(futures):
-            awards, selection = future.result()
-            awards_of_all_year.extend(awards)
-            selection_of_all_year.extend(selection)
-
-    selection_of_all_year.sort(key=lambda x: x["year"], reverse=True)
-    awards_of_all_year.sort(key=lambda x: x["year"], reverse=True)
-
-    save_to_excel(selection_of_all_year, awards_of_all_year, filename)
-
-
-def save_to_excel(selection: list, awards: list, path: str) -> None:
-    with pd.ExcelWriter(path + ".xlsx", engine="openpyxl") as writer:
-        df = pd.DataFrame(selection)
-        df.to_excel(writer, sheet_name="selection", index=False)
-
-        df = pd.DataFrame(awards)
-        df.to_excel(writer, sheet_name="awards", index=False)
-
-        print(f"Data saved to {os.getcwd()}\\{path}.xlsx")
+def edition_of(year: int) -> int:
+    return year - start_year + 1
+
+
+def parse_page(path: str, kind: str, year: int) -> Table:
+    content = read_page(path)
+
+    edition = edition_of(year)
+    parse = parse_awards if kind == "awards" else parse_selection
+    return cached_parse("cannes", content, parse, year, edition, content)
+
+
+def main(
+    executor: str = parse_executor,
+    mirror_media: bool = mirror_media,
+    use_sqlite: bool = use_sqlite,
+):
+    journal = Journal("cannes")
+    fetch_save_content(end_year, journal=journal)
+
+    years = [
+        year for year in range(end_year, start_year - 1, -1) if year not in except_years
+    ]
+
+    images = []
+    sink = Sink() if use_sqlite else None
+
+    # 按年份从新到旧依次取结果，解析完一年就写一年，不再攒齐全部数据再排序
+    with make_executor(executor) as pool, open_writer(f"{filename}.xlsx") as writer:
+        futures = {
+            (year, kind): pool.submit(parse_page, page_path(year, kind), kind, year)
+            for year in years
+            for kind in page_urls
+        }
+        writer.add_sheet("selection", list(CannesSelection._fields))
+        writer.add_sheet("awards", list(CannesAward._fields))
+        for year in years:
+            for kind in page_urls:
+                # 子进程按列传回结果，表头由 schema 给出
+                rows = futures.pop((year, kind)).result()
+                writer.write_rows(kind, rows)
+                images.extend(rows.column("img"))
+                if sink is not None:
+                    sink.write(rows.schema, rows, [edition_of(year)])
+
+    print(f"Data saved to {os.getcwd()}\\{filename}.xlsx")
+    if sink is not None:
+        sink.close()
+    journal.clear()
+
+    if mirror_media:
+        MediaStore().mirror(images)
+
+
+def save_to_excel(selection, awards, path: str) -> None:
+    with open_writer(f"{path}.xlsx") as writer:
+        writer.add_sheet("selection", list(CannesSelection._fields))
+        writer.add_sheet("awards", list(CannesAward._fields))
+        writer.write_rows("selection", selection)
+        writer.write_rows("awards", awards)
+
+    print(f"Data saved to {os.getcwd()}\\{path}.xlsx")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,59 @@
+import json
+import os
+import threading
+
+checkpointdir = ".checkpoints"
+
+
+class Journal:
+    # 追加写的 JSONL 日志，每完成一个单元（届次、年份、页）就写一行并 fsync，
+    # 程序中途挂掉后重跑，已完成的单元直接从日志里取回解析结果
+    def __init__(self, name: str, root: str = checkpointdir):
+        self.path = os.path.join(root, f"{name}.jsonl")
+        self.units = {}
+        torn = False
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 挂掉时写了一半的行跳过，后面几次运行追加的行还能用
+                        continue
+                    self.units[entry["unit"]] = entry["records"]
+            if self.units:
+                print(f"Resuming from {self.path}: {len(self.units)} units done")
+
+        os.makedirs(root, exist_ok=True)
+        self.file = open(self.path, "a", encoding="utf-8")
+        if torn:
+            # 半行先用换行结束，免得下一条记录粘在它后面一起读不出来
+            self.file.write("\n")
+            self.file.flush()
+        self.lock = threading.Lock()
+
+    def __contains__(self, unit) -> bool:
+        return str(unit) in self.units
+
+    def records(self, unit) -> list:
+        return self.units[str(unit)]
+
+    def record(self, unit, records: list = ()) -> None:
+        line = json.dumps(
+            {"unit": str(unit), "records": list(records)}, ensure_ascii=False
+        )
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.units[str(unit)] = list(records)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def clear(self) -> None:
+        # 整个流程成功结束后删掉日志，下次从头开始
+        self.close()
+        os.remove(self.path)
+        self.units = {}
@@ -1,9 +1,21 @@
+import os
+import sys
+
 import pandas as pd
 
+from exporters import export_table
+
+# 用法：python csv2xlsx.py [file.csv] [xlsx parquet arrow jsonl ...]
+csv_file = (
+    sys.argv[1]
+    if len(sys.argv) > 1
+    else "rollingstone_best_albums_of_all_time_2023.csv"
+)
+formats = tuple(sys.argv[2:]) or ("xlsx",)
+
 # 读取 UTF-8 编码的 CSV 文件
-csv_file = "rollingstone_best_albums_of_all_time_2023.csv"
 df = pd.read_csv(csv_file, encoding="utf-8")
 
-# 将数据写入 XLSX 文件
-xlsx_file = "rollingstone_best_albums_of_all_time_2023.xlsx"
-df.to_excel(xlsx_file, index=False, engine='openpyxl')
\ No newline at end of file
+# 将数据写入 XLSX 等格式
+for path in export_table(df, os.path.splitext(csv_file)[0], formats):
+    print(f"Data saved to {path}")
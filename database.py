@@ -0,0 +1,130 @@
+import sqlite3
+from typing import NamedTuple
+
+from records import CannesAward, CannesSelection, GrammyNomination, OscarsNomination
+
+# 用回滚日志而不是 WAL：WAL 靠共享内存协调读写，只在同一台机器上有效，
+# 分布式 worker 把结果写到网络共享上的同一个库时会出错
+dbpath = "crawlers.db"
+batch_size = 1000
+
+
+class Spec(NamedTuple):
+    table: str
+    category: str  # 奖项/类别列，和届次、提名顺序一起构成主键
+    order: str  # 记录里自带提名顺序的列；没有就按类别内出现的顺序编号
+    indexes: tuple
+
+
+specs = {
+    GrammyNomination: Spec(
+        "grammy", "award", "order", ("year", "edition", ("award", "win"))
+    ),
+    CannesSelection: Spec("cannes_selection", "title", None, ("year", "edition")),
+    CannesAward: Spec(
+        "cannes_awards", "title", None, ("year", "edition", "award", ("title", "award"))
+    ),
+    OscarsNomination: Spec(
+        "oscars", "category", None, ("year", "edition", ("category", "win"))
+    ),
+}
+
+sqltypes = {int: "INTEGER", bool: "INTEGER", float: "REAL", str: "TEXT"}
+
+
+def quote(name: str) -> str:
+    # order 之类的列名是 SQL 关键字
+    return '"' + name.replace('"', '""') + '"'
+
+
+class Sink:
+    # 每个数据集一张表，主键 (edition, 类别, 提名顺序)，重抓时原地更新
+    def __init__(self, path: str = dbpath):
+        self.path = path
+        # 多个 worker 同时写时排队等锁，不立刻报 database is locked
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=DELETE")
+        self.created = set()
+
+    def columns(self, schema) -> list:
+        spec = specs[schema]
+        return list(schema._fields) + ([] if spec.order else ["position"])
+
+    def create(self, schema) -> None:
+        if schema in self.created:
+            return
+        spec = specs[schema]
+        order = spec.order or "position"
+        definitions = [
+            f"{quote(name)} {sqltypes.get(schema.__annotations__.get(name), 'INTEGER')}"
+            for name in self.columns(schema)
+        ]
+        key = ", ".join(map(quote, ("edition", spec.category, order)))
+        with self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(spec.table)} "
+                f"({', '.join(definitions)}, PRIMARY KEY ({key}))"
+            )
+            for index in spec.indexes:
+                index = (index,) if isinstance(index, str) else index
+                name = quote(f"{spec.table}_{'_'.join(index)}")
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON {quote(spec.table)} "
+                    f"({', '.join(map(quote, index))})"
+                )
+        self.created.add(schema)
+
+    def write(self, schema, rows, editions=None) -> int:
+        # rows 是 schema 记录（或 records.Table），按届整体替换：同一事务里先删掉 editions
+        # 列出的届次，再按 batch_size 批量 upsert；届次由调用方给出，重抓后一行都没有的
+        # 届次也能清空。editions 为 None 表示 rows 是全部数据，整张表替换
+        self.create(schema)
+        spec = specs[schema]
+        columns = self.columns(schema)
+        order = spec.order or "position"
+        key = ("edition", spec.category, order)
+        updates = [c for c in columns if c not in key]
+        sql = (
+            f"INSERT INTO {quote(spec.table)} ({', '.join(map(quote, columns))}) "
+            f"VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT ({', '.join(map(quote, key))}) DO UPDATE SET "
+            + ", ".join(f"{quote(c)} = excluded.{quote(c)}" for c in updates)
+        )
+
+        positions = {}
+
+        def values(row):
+            row = tuple(row)
+            if spec.order:
+                return row
+            # 同一届同一类别里按出现顺序编号
+            record = schema._make(row)
+            group = (record.edition, getattr(record, spec.category))
+            positions[group] = positions.get(group, 0) + 1
+            return row + (positions[group],)
+
+        rows = [values(row) for row in rows]
+        with self.connection:
+            # 先清掉要替换的届次，重抓时网站上删掉的提名不会留在表里
+            if editions is None:
+                self.connection.execute(f"DELETE FROM {quote(spec.table)}")
+            else:
+                self.connection.executemany(
+                    f"DELETE FROM {quote(spec.table)} WHERE edition = ?",
+                    [(edition,) for edition in editions],
+                )
+            for start in range(0, len(rows), batch_size):
+                self.connection.executemany(sql, rows[start : start + batch_size])
+        return len(rows)
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        return self.connection.execute(sql, params).fetchall()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,93 +1,174 @@
-from bs4 import BeautifulSoup
+import concurrent.futures
 import re  # 正则表达式，进行文字匹配
-import urllib.request
-import urllib.error  # 指定URL，获取网页数据
-import openpyxl  # 进行excel操作
+from typing import NamedTuple
+import requests  # 指定URL，获取网页数据
+
+from checkpoint import Journal
+from exporters import open_writer  # 进行excel操作
+from frontier import Frontier
+from http_client import get_client
+from media import MediaStore
+from parsers import make_soup
+
+# 把海报镜像到本地 media/ 目录
+mirror_media = False
+
+# 再逐个抓电影详情页补上片长、类型、导演、完整主演和 IMDb 编号
+# 详情页记在 .frontier/douban.db 里，抓过的以后都不再抓
+deep_crawl = False
 
 
 def main():
     baseurl = "https://movie.douban.com/top250?start="
-    datalist = getdata(baseurl)
+    journal = Journal("douban")  ##每爬完一页记一次，中途失败重跑时接着爬
+    datalist = getdata(baseurl, journal=journal)
     savepath = "豆瓣电影top250.xlsx"
-    savedata(datalist, savepath)
+    details = getdetails(datalist) if deep_crawl else None
+    savedata(datalist, savepath, details)
+    journal.clear()
+    if mirror_media:
+        MediaStore().mirror(movie.imgSrc for movie in datalist)
+
+
+class Movie(NamedTuple):  ##一部电影的所有信息，顺序和excel项目栏一致
+    link: str
+    imgSrc: str
+    title: str
+    foreignTitle: str
+    rating: float
+    judgeNum: int
+    inq: str
+    actor: str
+    year: int
+    country: str
+    tag: str
+
+
+class Detail(NamedTuple):  ##详情页的信息，和Movie按link对应
+    link: str
+    runtime: int
+    genres: str
+    directors: str
+    cast: str
+    imdb: str
 
 
 # compile返回的是匹配到的模式对象
-findLink = re.compile(r'<a href="(.*?)">')  # 正则表达式模式的匹配，影片详情
-findImgSrc = re.compile(r'<img.*src="(.*?)"', re.S)  # re.S让换行符包含在字符中,图片信息
-findTitle = re.compile(r'<span class="title">(.*)</span>')  # 影片片名
-findRating = re.compile(
-    r'<span class="rating_num" property="v:average">(.*)</span>'
-)  # 找到评分
-findJudge = re.compile(r"<span>(\d*)人评价</span>")  # 找到评价人数 #\d表示数字
-findInq = re.compile(r'<span class="inq">(.*)</span>')  # 找到概况
-findBd = re.compile(
-    r'<p class="">(.*?)</p>', re.S
-)  # 找到影片的相关内容，如导演，演员等
-findMore = re.compile(r"\s*(.+?)<br[/]?>\s*(\d{4}).*/\s*(.+?)\s*/\s*(.+)")
+findJudge = re.compile(r"^\s*(\d+)人评价\s*$")  # 找到评价人数 #\d表示数字
+findMore = re.compile(r"(\d{4}).*/\s*(.+?)\s*/\s*(.+)")  # 年份 / 国家 / 标签
 
 
 ##获取网页数据
-def getdata(baseurl):
-    datalist = []
-    for i in range(0, 10):
-        url = baseurl + str(
-            i * 25
-        )  ##豆瓣页面上一共有十页信息，一页爬取完成后继续下一页
+def getdata(baseurl, workers=10, journal=None):
+    urls = [
+        baseurl + str(i * 25) for i in range(0, 10)
+    ]  ##豆瓣页面上一共有十页信息，十页同时请求
+
+    def getpage(url):
+        if journal is not None and url in journal:  ##上次已经爬完的页直接从日志里取
+            return [Movie(*data) for data in journal.records(url)]
         html = geturl(url)
-        soup = BeautifulSoup(
-            html, "html.parser"
-        )  # 构建了一个BeautifulSoup类型的对象soup，是解析html的
-        for item in soup.find_all("div", class_="item"):  ##find_all返回的是一个列表
-            data = []  # 保存HTML中一部电影的所有信息
-            item = str(item).replace(
-                "\xa0", " "
-            )  ##需要先转换为字符串findall才能进行搜索
-            link = re.findall(findLink, item)[0]  ##findall返回的是列表，索引只将值赋值
-            data.append(link)
-
-            imgSrc = re.findall(findImgSrc, item)[0]
-            data.append(imgSrc)
-
-            titles = re.findall(
-                findTitle, item
-            )  ##有的影片只有一个中文名，有的有中文和英文
-            if len(titles) == 2:
-                onetitle = titles[0]
-                data.append(onetitle)
-                twotitle = titles[1].replace("/", "")  # 去掉无关的符号
-                data.append(twotitle)
-            else:
-                data.append(titles[0])
-                data.append(" ")  ##将下一个值空出来
-
-            rating = re.findall(findRating, item)[0]  # 添加评分
-            data.append(rating)
-
-            judgeNum = re.findall(findJudge, item)[0]  # 添加评价人数
-            data.append(judgeNum)
-
-            inq = re.findall(findInq, item)  # 添加概述
-            if len(inq) != 0:
-                inq = inq[0].replace("。", "")
-                data.append(inq)
-            else:
-                data.append(" ")
-
-            bd = re.findall(findBd, item)[0].replace("&nbsp;", " ")  # 添加影片相关内容
-            more = re.search(findMore, bd)
-            actor, year, country, tag = (more.group(i).strip() for i in range(1, 5))
-            data.extend([actor, year, country, tag])
-            datalist.append(data)
+        soup = make_soup(html)  # 构建了一个BeautifulSoup类型的对象soup，是解析html的
+        movies = [
+            parseitem(item) for item in soup.find_all("div", class_="item")
+        ]  ##find_all返回的是一个列表
+        if journal is not None:
+            journal.record(url, movies)
+        return movies
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(getpage, url) for url in urls]
+        concurrent.futures.wait(futures)  ##等十页都结束，成功的页都记进日志
+
+    datalist = []
+    for future in futures:  ##按urls的顺序拼接
+        datalist.extend(future.result())
     return datalist
 
 
+##直接从解析好的节点里取字段，不再把节点转回字符串做正则匹配
+def parseitem(item):
+    link = item.find("a")["href"]  # 影片详情
+    imgSrc = item.find("img")["src"]  # 图片信息
+
+    titles = [
+        text(span).strip("/ ") for span in item.find_all("span", class_="title")
+    ]  ##有的影片只有一个中文名，有的有中文和英文
+    title = titles[0]
+    foreignTitle = titles[1] if len(titles) > 1 else ""
+
+    rating = float(item.find("span", class_="rating_num").string)  # 评分
+    ##评价人数单独在一个 span 里，不能拿整个 div.star 的文字去匹配，没有空白时会和评分粘在一起
+    votes = item.find("div", class_="star").find("span", string=findJudge)
+    judgeNum = int(findJudge.search(votes.string).group(1))
+
+    inq = item.find("span", class_="inq")  # 概况
+    inq = text(inq).replace("。", "") if inq else ""
+
+    bd = [
+        line.replace("\xa0", " ").strip()
+        for line in item.find("div", class_="bd").find("p").stripped_strings
+    ]  # 影片的相关内容：第一行导演及演员，第二行年份、国家和标签
+    actor = bd[0]
+    more = findMore.search(bd[-1])
+    year, country, tag = (more.group(i).strip() for i in range(1, 4))
+
+    return Movie(
+        link,
+        imgSrc,
+        title,
+        foreignTitle,
+        rating,
+        judgeNum,
+        inq,
+        actor,
+        int(year),
+        country,
+        tag,
+    )
+
+
+##抓详情页：按榜单名次的顺序，最多workers页同时在抓
+def getdetails(datalist, workers=4):
+    with Frontier("douban") as frontier:
+        frontier.add((movie.link, rank) for rank, movie in enumerate(datalist, 1))
+        frontier.crawl(lambda url: (parsedetail(url, geturl(url)), []), workers)
+        results = frontier.results()
+    return [
+        Detail(**results[movie.link]) for movie in datalist if movie.link in results
+    ]
+
+
+def parsedetail(url, html):
+    soup = make_soup(html)
+    runtime = soup.find("span", property="v:runtime")
+    imdb = ""
+    for label in soup.select("#info span.pl"):
+        if label.get_text().strip().rstrip(":：") == "IMDb":
+            imdb = str(label.next_sibling).strip()
+            break
+    return {
+        "link": url,
+        "runtime": (
+            int(runtime["content"]) if runtime and runtime.get("content") else None
+        ),
+        "genres": " / ".join(
+            text(tag) for tag in soup.find_all("span", property="v:genre")
+        ),
+        "directors": " / ".join(
+            text(tag) for tag in soup.find_all("a", rel="v:directedBy")
+        ),
+        "cast": " / ".join(text(tag) for tag in soup.find_all("a", rel="v:starring")),
+        "imdb": imdb,
+    }
+
+
+def text(tag):
+    return tag.get_text().replace("\xa0", " ").strip()
+
+
 ##保存数据
-def savedata(datalist, savepath):
-    workbook = openpyxl.Workbook()
-    worksheet = workbook.active
-    worksheet.title = "豆瓣电影top250"
-    
+def savedata(datalist, savepath, details=None):
     column = (
         "电影详情链接",
         "图片链接",
@@ -101,32 +182,31 @@ def savedata(datalist, savepath):
         "国家",
         "标签",
     )  ##excel项目栏
-    worksheet.append(column)  # 添加表头
-
-    for data in datalist:
-        worksheet.append(data)  # 添加数据行
-
-    workbook.save(savepath)
+    with open_writer(savepath) as writer:  # 边写边落盘，不在内存里攒整张表
+        writer.add_sheet("豆瓣电影top250", column)  # 添加表头
+        writer.write_rows("豆瓣电影top250", datalist)  # 添加数据行
+        if details is not None:  ##详情页的信息单独一张表
+            writer.add_sheet(
+                "电影详情",
+                ("电影详情链接", "片长(分钟)", "类型", "导演", "主演", "IMDb"),
+            )
+            writer.write_rows("电影详情", details)
 
 
 ##爬取网页
 def geturl(url):
-    head = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0.4240.111 Safari/537.36"
-    }
-    req = urllib.request.Request(url, headers=head)
     try:  ##异常检测
-        response = urllib.request.urlopen(req)
-        html = response.read().decode("utf-8")
-    except urllib.error.URLError as e:
-        if hasattr(e, "code"):  ##如果错误中有这个属性的话
-            print(e.code)
-        if hasattr(e, "reason"):
-            print(e.reason)
+        response = get_client().get(url)
+        response.raise_for_status()
+        html = response.content.decode("utf-8")
+    except requests.RequestException as e:
+        if e.response is not None:  ##如果错误中有状态码的话
+            print(e.response.status_code)
+        print(e)
+        raise  ##这一页没拿到就不要当成空页继续解析
     return html
 
 
 if __name__ == "__main__":
     main()
-    print("爬取成功！！！")
\ No newline at end of file
+    print("爬取成功！！！")
@@ -0,0 +1,52 @@
+import json
+import re
+
+# WordPress 输出的内联脚本里夹着 HTML 实体，有时还会被转义两次（&amp;#8217;）
+entities = {
+    "&#8216;": "‘",
+    "&#8217;": "’",
+    "&#8230;": "…",
+    "\u2008": " ",
+}
+entities.update({"&amp;" + k[1:]: v for k, v in entities.items() if k[0] == "&"})
+entities["&amp;"] = "&"
+entity_pattern = re.compile("|".join(map(re.escape, entities)))
+
+decoder = json.JSONDecoder()
+
+
+def find_script(content, script_id: str) -> bytes:
+    # 直接在字节流里找 <script id="...">...</script>，不构建 DOM
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+
+    for quote in (b'"', b"'"):
+        marker = b"id=" + quote + script_id.encode("utf-8") + quote
+        pos = content.find(marker)
+        while pos >= 0:
+            tag = content.rfind(b"<", 0, pos)
+            if content[tag : tag + 7].lower() == b"<script":
+                start = content.index(b">", pos) + 1
+                end = content.index(b"</script>", start)
+                return content[start:end]
+            pos = content.find(marker, pos + len(marker))
+
+    raise ValueError(f"<script id={script_id!r}> not found")
+
+
+def next_data(content) -> dict:
+    return json.loads(find_script(content, "__NEXT_DATA__"))
+
+
+def unescape(text: str) -> str:
+    return entity_pattern.sub(lambda match: entities[match.group()], text)
+
+
+def js_variable(content, script_id: str, name: str):
+    # 取出 var name = {...}; 的值，raw_decode 只解析到 JSON 结束为止
+    text = unescape(find_script(content, script_id).decode("utf-8"))
+    match = re.search(rf"var\s+{re.escape(name)}\s*=\s*", text)
+    if match is None:
+        raise ValueError(f"var {name} not found in <script id={script_id!r}>")
+    value, _ = decoder.raw_decode(text, match.end())
+    return value
@@ -0,0 +1,35 @@
+import concurrent.futures
+import multiprocessing
+
+kinds = ("thread", "process", "inline")
+
+# 进程池的子进程不用 fork 启动：runner 在多个线程里同时建进程池，fork 会把
+# 别的线程正持有的锁（比如归档的锁）原样复制进子进程，子进程可能永远卡住
+start_method = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+class InlineExecutor(concurrent.futures.Executor):
+    # 在当前线程里直接执行，方便调试和对比
+    def submit(self, fn, /, *args, **kwargs):
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def make_executor(kind: str = "thread", workers: int = None):
+    if kind == "thread":
+        return concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    if kind == "process":
+        # BeautifulSoup 解析是纯 Python 的 CPU 活，只有多进程才能用满多核
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context(start_method)
+        )
+    if kind == "inline":
+        return InlineExecutor()
+    raise ValueError(f"Unknown executor {kind!r}, expected one of {kinds}")
+
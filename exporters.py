@@ -0,0 +1,214 @@
+import concurrent.futures
+import csv
+import hashlib
+import io
+import os
+import re
+import zipfile
+
+import pandas as pd
+from openpyxl import Workbook
+
+from http_cache import atomic_write
+
+# xlsx 单个 sheet 最多 1048576 行（含表头），超出后自动续写到 name-2、name-3 ...
+max_rows = 1048576
+
+
+class XlsxWriter:
+    # write-only 模式下每行写完就落到临时文件，内存占用不随行数增长
+    def __init__(self, path: str):
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheets = {}
+
+    def add_sheet(self, name: str, columns: list = None) -> None:
+        self.sheets[name] = {"columns": columns, "part": 0, "ws": None, "rows": 0}
+        self._next_part(name)
+
+    def _next_part(self, name: str) -> None:
+        sheet = self.sheets[name]
+        sheet["part"] += 1
+        title = name if sheet["part"] == 1 else f"{name[:28]}-{sheet['part']}"
+        sheet["ws"] = self.workbook.create_sheet(title=title[:31])
+        sheet["rows"] = 0
+        if sheet["columns"] is not None:
+            sheet["ws"].append(sheet["columns"])
+            sheet["rows"] = 1
+
+    def write(self, name: str, row) -> None:
+        if name not in self.sheets:
+            self.add_sheet(name)
+        sheet = self.sheets[name]
+        if sheet["columns"] is None and isinstance(row, dict):
+            # 没给列名时用第一行 dict 的键作表头
+            sheet["columns"] = list(row)
+            sheet["ws"].append(sheet["columns"])
+            sheet["rows"] += 1
+        if sheet["rows"] >= max_rows:
+            self._next_part(name)
+
+        if isinstance(row, dict):
+            row = [row.get(column) for column in sheet["columns"]]
+        sheet["ws"].append(list(row))
+        sheet["rows"] += 1
+
+    def write_rows(self, name: str, rows) -> None:
+        for row in rows:
+            self.write(name, row)
+
+    def close(self) -> None:
+        self.workbook.save(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if exc[0] is None:
+            self.close()
+
+
+class CsvWriter:
+    # 每个 sheet 一个文件：path 为 data.csv 时写出 data-<sheet>.csv
+    def __init__(self, path: str, single: bool = False):
+        self.path = path
+        self.single = single
+        self.sheets = {}
+
+    def add_sheet(self, name: str, columns: list = None) -> None:
+        stem, ext = os.path.splitext(self.path)
+        path = self.path if self.single else f"{stem}-{name}{ext}"
+        f = open(path, "w", newline="", encoding="utf-8")
+        self.sheets[name] = {"columns": columns, "file": f, "writer": csv.writer(f)}
+        if columns is not None:
+            self.sheets[name]["writer"].writerow(columns)
+
+    def write(self, name: str, row) -> None:
+        if name not in self.sheets:
+            self.add_sheet(name)
+        sheet = self.sheets[name]
+        if sheet["columns"] is None and isinstance(row, dict):
+            sheet["columns"] = list(row)
+            sheet["writer"].writerow(sheet["columns"])
+
+        if isinstance(row, dict):
+            row = [row.get(column) for column in sheet["columns"]]
+        sheet["writer"].writerow(row)
+
+    def write_rows(self, name: str, rows) -> None:
+        for row in rows:
+            self.write(name, row)
+
+    def close(self) -> None:
+        for sheet in self.sheets.values():
+            sheet["file"].close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_writer(path: str, single: bool = False):
+    if path.endswith(".csv"):
+        return CsvWriter(path, single)
+    return XlsxWriter(path)
+
+
+def dedupe_media(path: str) -> int:
+    # openpyxl 给每个图片锚点单独写一份 xl/media/imageN，内容相同的只保留第一份，
+    # 绘图关系里的 Target 改成指向它
+    with zipfile.ZipFile(path) as archive:
+        entries = [(info, archive.read(info)) for info in archive.infolist()]
+
+    first = {}
+    renamed = {}
+    for info, data in entries:
+        if info.filename.startswith("xl/media/"):
+            name = info.filename[len("xl/media/") :]
+            digest = hashlib.sha256(data).hexdigest()
+            if digest in first:
+                renamed[name] = first[digest]
+            else:
+                first[digest] = name
+    if not renamed:
+        return 0
+
+    target = re.compile(r'Target="((?:\.\./|/xl/)media/)([^"]+)"')
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for info, data in entries:
+            name = info.filename[len("xl/media/") :]
+            if info.filename.startswith("xl/media/") and name in renamed:
+                continue
+            if info.filename.endswith(".rels"):
+                data = target.sub(
+                    lambda m: f'Target="{m.group(1)}{renamed.get(m.group(2), m.group(2))}"',
+                    data.decode("utf-8"),
+                ).encode("utf-8")
+            archive.writestr(info, data)
+
+    atomic_write(path, buffer.getvalue())
+    return len(renamed)
+
+
+def write_csv(df: pd.DataFrame, path: str) -> None:
+    df.to_csv(path, index=False, encoding="utf-8")
+
+
+def write_xlsx(df: pd.DataFrame, path: str, sheet_name: str = "data") -> None:
+    with XlsxWriter(path) as writer:
+        writer.add_sheet(sheet_name, list(df.columns))
+        writer.write_rows(sheet_name, df.itertuples(index=False, name=None))
+
+
+def write_jsonl(df: pd.DataFrame, path: str) -> None:
+    df.to_json(path, orient="records", lines=True, force_ascii=False)
+
+
+def write_parquet(df: pd.DataFrame, path: str) -> None:
+    df.to_parquet(path, index=False)
+
+
+def write_arrow(df: pd.DataFrame, path: str) -> None:
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+writers = {
+    "csv": write_csv,
+    "xlsx": write_xlsx,
+    "jsonl": write_jsonl,
+    "parquet": write_parquet,
+    "arrow": write_arrow,
+}
+
+
+def export_table(
+    table, stem: str, formats: tuple = ("csv", "xlsx"), columns: list = None
+) -> list:
+    # 同一张表只建一次 DataFrame，各格式之间互不依赖，并行写出
+    unknown = [fmt for fmt in formats if fmt not in writers]
+    if unknown:
+        raise ValueError(f"Unknown formats {unknown}, expected some of {list(writers)}")
+
+    df = (
+        table
+        if isinstance(table, pd.DataFrame)
+        else pd.DataFrame(table, columns=columns)
+    )
+    paths = [f"{stem}.{fmt}" for fmt in formats]
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=len(formats) or 1
+    ) as executor:
+        futures = [
+            executor.submit(writers[fmt], df, path) for fmt, path in zip(formats, paths)
+        ]
+        for future in futures:
+            future.result()
+
+    return paths
@@ -0,0 +1,124 @@
+import concurrent.futures
+import json
+import os
+import sqlite3
+
+import requests
+
+# 持久化的 URL 边界：SQLite 里一张表既是优先队列也是去重集合，
+# 加进来过的 URL 不会再加第二次，抓完的结果存在表里，以后的运行直接取
+frontierdir = ".frontier"
+max_attempts = 3
+
+
+class Frontier:
+    def __init__(self, name: str, root: str = frontierdir):
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, f"{name}.db")
+        self.connection = sqlite3.connect(self.path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS urls ("
+                "url TEXT PRIMARY KEY, priority INTEGER, state TEXT DEFAULT 'pending', "
+                "attempts INTEGER DEFAULT 0, data TEXT, error TEXT)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS urls_queue ON urls (state, priority)"
+            )
+
+    def __contains__(self, url: str) -> bool:
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM urls WHERE url = ?", (url,)
+            ).fetchone()
+            is not None
+        )
+
+    def add(self, urls, priority: int = 0) -> int:
+        # urls 可以是 URL 列表，也可以是 (url, priority) 列表；priority 小的先抓
+        items = [
+            (url, priority) if isinstance(url, str) else tuple(url) for url in urls
+        ]
+        with self.connection:
+            cursor = self.connection.executemany(
+                "INSERT OR IGNORE INTO urls (url, priority) VALUES (?, ?)", items
+            )
+        return cursor.rowcount
+
+    def pending(self) -> list:
+        return [
+            url
+            for (url,) in self.connection.execute(
+                "SELECT url FROM urls WHERE state = 'pending' ORDER BY priority, rowid"
+            )
+        ]
+
+    def done(self, url: str, data) -> None:
+        with self.connection:
+            self.connection.execute(
+                "UPDATE urls SET state = 'done', data = ?, error = NULL WHERE url = ?",
+                (json.dumps(data, ensure_ascii=False), url),
+            )
+
+    def failed(self, url: str, error: str) -> None:
+        # 失败的 URL 留在队列里下次再试，超过 max_attempts 次就放弃
+        with self.connection:
+            self.connection.execute(
+                "UPDATE urls SET attempts = attempts + 1, error = ?, "
+                "state = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END "
+                "WHERE url = ?",
+                (error, max_attempts, url),
+            )
+
+    def results(self) -> dict:
+        return {
+            url: json.loads(data)
+            for url, data in self.connection.execute(
+                "SELECT url, data FROM urls WHERE state = 'done'"
+            )
+        }
+
+    def crawl(self, fetch, workers: int = 4) -> int:
+        # fetch(url) 返回 (data, 新发现的 [(url, priority)])；最多 workers 个同时在抓，
+        # 每抓完一个就提交，中途停掉下次从剩下的 pending 接着抓
+        fetched = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                queue = self.pending()
+                if not queue:
+                    return fetched
+                running = {}
+                for url in queue:
+                    while len(running) >= workers:
+                        fetched += self._finish(running)
+                    running[executor.submit(fetch, url)] = url
+                while running:
+                    fetched += self._finish(running)
+
+    def _finish(self, running: dict) -> int:
+        finished, _ = concurrent.futures.wait(
+            running, return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        count = 0
+        for future in finished:
+            url = running.pop(future)
+            try:
+                data, links = future.result()
+            except (requests.RequestException, ValueError) as e:
+                print(f"\033[31mFailed to fetch {url} due to {e}\033[0m")
+                self.failed(url, repr(e))
+                continue
+            self.done(url, data)
+            if links:
+                self.add(links)
+            count += 1
+        return count
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
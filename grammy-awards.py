@@ -1,13 +1,25 @@
+import asyncio
+import concurrent.futures
 import re
-import requests
-from bs4 import BeautifulSoup
 import json
-import pandas as pd
 import os
-from openpyxl import load_workbook
+import threading
+import requests
+from openpyxl import Workbook
 from openpyxl.drawing.image import Image
+from openpyxl.utils import get_column_letter
+from PIL import Image as PILImage, ImageOps
 from io import BytesIO
 
+from checkpoint import Journal
+from database import Sink
+from embedded import next_data
+from exporters import dedupe_media, open_writer
+from http_client import get_client
+from media import MediaStore
+from manifest import Manifest, digest_of, load_rows, merge_rows
+from records import GrammyNomination, Table
+
 # 首届格莱美于1959年举办，褒奖1958年的音乐成就
 # 在官网上首届格莱美称为1958年格莱美奖
 magic_number = 1957
@@ -15,122 +27,269 @@ domain = "https://www.grammy.com/"
 target = f"{domain}awards/67th-annual-grammy-awards-2024"
 
 default_avatar = "https://naras.a.bigcontent.io/v1/static/artist_default_200x200"
+thumb_size = (40, 40)
 
 filename = "grammy-awards-of-all-years"
 
-headers = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36"
-}
+# 同时抓取的届数上限
+concurrency = 8
 
+# 增量模式只抓清单里没有的届次和最新一届，其余沿用已导出的数据
+incremental = True
 
-def main():
-    json_data = fetch_and_parse(target)
+# 官网是 Next.js 站点，/_next/data/<buildId>/... 直接返回页面的 JSON 数据
+# buildId 从第一页的 __NEXT_DATA__ 里取，网站重新部署后旧的会失效
+use_next_data = True
+build_id = None
+build_id_lock = threading.Lock()
 
-    awards_data_of_all_years = []
+# 把艺人头像镜像到本地 media/ 目录
+mirror_media = False
 
-    last_awards_data = parse_data(json_data)
-    awards_data_of_all_years.extend(last_awards_data)
+# 同时把结果 upsert 进 SQLite（crawlers.db），按届次、奖项、提名顺序原地更新
+use_sqlite = False
 
+
+def main(limit: int = concurrency, incremental: bool = incremental):
+    global build_id
+
+    manifest = Manifest("grammy")
+    existing = []
+    if incremental and os.path.exists(f"{filename}.xlsx"):
+        existing = load_rows(f"{filename}.xlsx", "grammy-awards", GrammyNomination)
+    else:
+        manifest.reset()
+
+    json_data = fetch_and_parse(target)
+    if use_next_data:
+        build_id = json_data.get("buildId")
+
+    awards_years_results_links = edition_links(json_data)
+    # 届次编号最大的是最新一届，每次都检查是否有变化；历史届次抓过一次就不再重抓
+    latest = max(
+        awards_years_results_links,
+        key=lambda link: get_th_order(link[len(domain) :]) or 0,
+    )
     awards_years_results_links = [
-        domain + item["slug"]
-        for item in json_data["props"]["pageProps"]["pageContent"][
-            "getAwardsYearsList"
-        ]["hits"]
+        link
+        for link in awards_years_results_links
+        if link == latest or link not in manifest
     ]
 
-    awards_years_results_links.remove(target)
-    for link in awards_years_results_links:
-        json_data = fetch_and_parse(link)
-        awards_data = parse_data(json_data)
+    # 每抓完一届就记进日志，中途失败重跑时已完成的届次不用再抓
+    journal = Journal("grammy")
+
+    # 目标页为了拿届次列表已经抓过了，需要它的数据时直接解析，不再请求一次
+    fetch_links = [link for link in awards_years_results_links if link != target]
+    pages = asyncio.run(fetch_and_parse_all(fetch_links, limit, journal))
+    if target in awards_years_results_links:
+        fetch_links = [target] + fetch_links
+        pages = [parse_data(json_data)] + pages
+
+    awards_data_of_all_years = Table(GrammyNomination)
+    for link, awards_data in zip(fetch_links, pages):
+        digest = digest_of(json.dumps(list(awards_data), ensure_ascii=False))
+        if not manifest.changed(link, digest):
+            print(f"{link} unchanged, skipped")
+            continue
+        manifest.mark(link, digest, len(awards_data))
         awards_data_of_all_years.extend(awards_data)
 
+    awards_data_of_all_years = merge_rows(existing, awards_data_of_all_years, "edition")
     save_to_excel(awards_data_of_all_years, filename, False)
+    if use_sqlite:
+        with Sink() as sink:
+            sink.write(GrammyNomination, awards_data_of_all_years)
+    manifest.save()
+    journal.clear()
+
+    if mirror_media:
+        MediaStore().mirror(row.avatar for row in awards_data_of_all_years)
+
+
+def edition_links(json_data: dict) -> list:
+    # 目标页的 getAwardsYearsList 列出了所有届次的页面
+    return [
+        domain + item["slug"]
+        for item in json_data["props"]["pageProps"]["pageContent"][
+            "getAwardsYearsList"
+        ]["hits"]
+    ]
 
 
 def save_to_excel(
     awards_data_of_all_years: list, path: str, with_img: bool = False
 ) -> None:
-    df = pd.DataFrame(awards_data_of_all_years)
-    df.to_excel(f"{path}.xlsx", sheet_name="grammy-awards", index=False)
-
-    wb = load_workbook(f"{path}.xlsx")
-    ws = wb["grammy-awards"]
-
-    if with_img:
-        ws.cell(row=1, column=len(df.columns) + 1, value="image")
-        ws.column_dimensions[chr(65 + len(df.columns) + 1)].width = 50
-        for i in range(1, len(awards_data_of_all_years) + 2):
-            ws.row_dimensions[i].height = 50
-
-        img_cache = {}
-
-        for idx, row in df.iterrows():
-            image_url = row["avatar"]
-            if image_url:
-                if image_url in img_cache.keys():
-                    cached_img = Image(BytesIO(img_cache[image_url]))
-                    cached_img.width, cached_img.height = 40, 40
-                    ws.add_image(cached_img, f"{chr(65 + len(df.columns))}{idx + 2}")
-                    print(
-                        f"\033[32m{idx + 1}/{len(awards_data_of_all_years)} Image {image_url} inserted from cache\033[0m"
-                    )
-                else:
-                    try:
-                        response = requests.get(image_url, headers=headers)
-                        response.raise_for_status()
-                        img = Image(BytesIO(response.content))
-                        img.width, img.height = 40, 40
-                        ws.add_image(img, f"{chr(65 + len(df.columns))}{idx + 2}")
-                        img_cache[image_url] = response.content
-                        print(
-                            f"{idx + 1}/{len(awards_data_of_all_years)} Image {image_url} inserted"
-                        )
-                    except Exception as e:
-                        default_img = Image(BytesIO(img_cache[default_avatar]))
-                        default_img.width, default_img.height = 40, 40
-                        ws.add_image(
-                            default_img, f"{chr(65 + len(df.columns))}{idx + 2}"
-                        )
-                        print(
-                            f"\033[31mFailed to insert image {image_url} due to {e}; Use default avatar instead\033[31m"
-                        )
+    if not with_img:
+        with open_writer(f"{path}.xlsx") as writer:
+            writer.add_sheet("grammy-awards", list(GrammyNomination._fields))
+            writer.write_rows("grammy-awards", awards_data_of_all_years)
+        print(f"Data saved to {os.getcwd()}\\{path}.xlsx")
+        return
+
+    thumbnails = fetch_thumbnails(
+        [row.avatar for row in awards_data_of_all_years], concurrency
+    )
+
+    columns = list(GrammyNomination._fields)
+    img_column = get_column_letter(len(columns) + 1)
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "grammy-awards"
+    ws.append(columns + ["image"])
+    ws.column_dimensions[img_column].width = 50
+    ws.row_dimensions[1].height = 50
+
+    for idx, row in enumerate(awards_data_of_all_years, start=2):
+        ws.append(list(row))
+        ws.row_dimensions[idx].height = 50
+
+        # 同一个头像只下载、缩放一次，每个单元格的 Image 共用同一份字节
+        data = thumbnails.get(row.avatar) or thumbnails.get(default_avatar)
+        if data is None:
+            continue
+        img = Image(BytesIO(data))
+        img.width, img.height = thumb_size
+        ws.add_image(img, f"{img_column}{idx}")
+
     wb.save(f"{path}.xlsx")
-    print(f"Data saved to {os.getcwd()}\\{path}.xlsx")
+    merged = dedupe_media(f"{path}.xlsx")
+    print(
+        f"Data saved to {os.getcwd()}\\{path}.xlsx ({merged} duplicate images merged)"
+    )
+
+
+def fetch_thumbnail(url: str) -> bytes:
+    try:
+        response = get_client().get(url)
+        response.raise_for_status()
+        with PILImage.open(BytesIO(response.content)) as image:
+            thumbnail = ImageOps.fit(image.convert("RGBA"), thumb_size)
+    except (requests.RequestException, OSError) as e:
+        print(f"\033[31mFailed to fetch image {url} due to {e}\033[0m")
+        return None
+
+    buffer = BytesIO()
+    thumbnail.save(buffer, format="PNG")
+    print(f"Image {url} fetched")
+    return buffer.getvalue()
+
+
+def fetch_thumbnails(urls: list, limit: int = concurrency) -> dict:
+    # 去重后并发下载，默认头像也一起取，下载失败的行用它顶替
+    unique = list(dict.fromkeys([default_avatar] + [url for url in urls if url]))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, limit)) as executor:
+        return dict(zip(unique, executor.map(fetch_thumbnail, unique)))
 
 
 def fetch_and_parse(url: str) -> dict:
-    response = requests.get(url, headers=headers)
+    # 重试由 http_client 负责，到这里还失败就直接抛出，不再返回 None 让 parse_data 崩
+    response = get_client().get(url)
+    response.raise_for_status()
+
+    try:
+        json_data = next_data(response.content)
+    except ValueError as e:
+        raise ValueError(f"Failed to find tag <script> in {url}") from e
+
+    print(f"Successfully fetched json data from {url}")
+
+    return json_data
+
+
+def next_data_url(url: str, build: str) -> str:
+    path = url[len(domain) :].strip("/")
+    return f"{domain}_next/data/{build}/{path}.json"
+
+
+def fetch_next_data(url: str, build: str) -> dict:
+    data_url = next_data_url(url, build)
+    response = get_client().get(data_url)
     if response.status_code != 200:
-        print("Failed to retrieve data")
         return
 
-    soup = BeautifulSoup(response.content, "html.parser")
-    script_tag = soup.find("script", id="__NEXT_DATA__")
-
-    if script_tag is None:
-        print("Failed to find tag <script>")
+    try:
+        data = response.json()
+    except ValueError:
+        return
+    if "pageProps" not in data:
         return
 
-    json_data = json.loads(script_tag.string)
-    if json_data is None:
-        print("Failed to retrieve JSON data")
+    print(f"Successfully fetched json data from {data_url}")
 
-    print(f"Successfully fetched json data from {url}")
+    # 和 __NEXT_DATA__ 的结构保持一致，parse_data 不用区分来源
+    return {"props": data, "buildId": build}
+
+
+def fetch_edition(url: str) -> dict:
+    global build_id
 
+    current = build_id
+    if current:
+        json_data = fetch_next_data(url, current)
+        if json_data is not None:
+            return json_data
+        print(f"\033[33mNo json data for {url}, fall back to the full page\033[0m")
+
+    json_data = fetch_and_parse(url)
+    fresh = json_data.get("buildId")
+    # 接口失败可能只是这一届的问题（5xx、404），整页里的 buildId 变了才说明网站重新部署过；
+    # 多个线程同时发现时只换一次
+    if current and fresh and fresh != current:
+        with build_id_lock:
+            if build_id == current:
+                print(f"\033[33mBuild id {current} is stale, switch to {fresh}\033[0m")
+                build_id = fresh
     return json_data
 
 
+async def fetch_and_parse_all(
+    links: list, limit: int = concurrency, journal: Journal = None
+) -> list:
+    # 所有届次同时发出请求，每页一到就交给 parse_data，结果按 links 的顺序返回
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max(1, limit))
+    results = [[] for _ in links]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, limit)) as pool:
+
+        async def fetch_one(index: int, link: str) -> None:
+            if journal is not None and link in journal:
+                results[index] = Table.from_rows(
+                    GrammyNomination, journal.records(link)
+                )
+                return
+            async with semaphore:
+                json_data = await loop.run_in_executor(pool, fetch_edition, link)
+            results[index] = parse_data(json_data)
+            if journal is not None:
+                journal.record(link, results[index])
+
+        # 等所有届次都结束再抛出第一个错误，让成功的届次都能记进日志
+        outcomes = await asyncio.gather(
+            *(fetch_one(i, link) for i, link in enumerate(links)),
+            return_exceptions=True,
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+
+    return results
+
+
 def parse_data(json_data: dict) -> list:
     awards_years = json_data["props"]["pageProps"]["pageContent"]["getAwardsYears"][
         "hits"
     ][0]
 
     edition = get_th_order(awards_years["title"])  # 67 "67th Annual GRAMMY Awards"
-    holdingYear = magic_number + edition  # 2025 举办年份
+    # 2025 举办年份；标题里找不到届次时两者都留空，照样产出记录
+    holdingYear = magic_number + edition if edition is not None else None
 
     print(f"\033[34mWelcome to the {edition}th Annual GRAMMY Awards!\033[0m")
 
-    awards_list = []
+    awards_list = Table(GrammyNomination)
 
     for award_detail in awards_years["categoryDetails"]:
         award_name = award_detail["title"][0]["name"]  # "Record Of The Year"
@@ -171,17 +330,17 @@ def parse_data(json_data: dict) -> list:
                 avatar = default_avatar
 
             single_award_list.append(
-                {
-                    "year": holdingYear,
-                    "edition": edition,
-                    "award": award_name,
-                    "part1": part1.replace("\r", "").replace("\n", ""),
-                    "part2": remove_tags(part2).replace("(", "").replace(")", ""),
-                    "part3": replace_unicode(part3),
-                    "win": isWinner,
-                    "order": nomineeOrder,
-                    "avatar": avatar,
-                }
+                GrammyNomination(
+                    year=holdingYear,
+                    edition=edition,
+                    award=award_name,
+                    part1=part1.replace("\r", "").replace("\n", ""),
+                    part2=remove_tags(part2).replace("(", "").replace(")", ""),
+                    part3=replace_unicode(part3),
+                    win=isWinner,
+                    order=nomineeOrder,
+                    avatar=avatar,
+                )
             )
 
             if isWinner:
@@ -191,7 +350,7 @@ def parse_data(json_data: dict) -> list:
 
         print(f"{edition}th {award_name}: {winner}")
 
-        single_award_list.sort(key=lambda x: x["order"])
+        single_award_list.sort(key=lambda x: x.order)
         awards_list.extend(single_award_list)
 
     return awards_list
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import tempfile
+
+cachedir = ".http-cache"
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    # 先写临时文件再 rename，中途失败不会留下半个文件
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class HttpCache:
+    # meta/<url 的哈希>.json 记录 ETag、Last-Modified 和正文哈希
+    # objects/<正文哈希> 存正文，内容相同的页面只存一份；
+    # 正文已经存进页面归档的，meta 里只记归档路径（archive），objects 里不再存
+    def __init__(self, root: str = cachedir):
+        self.root = root
+
+    def meta_path(self, url: str) -> str:
+        key = sha256(url.encode("utf-8"))
+        return os.path.join(self.root, "meta", key[:2], f"{key}.json")
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def lookup(self, url: str) -> dict:
+        try:
+            with open(self.meta_path(url), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not entry.get("archive") and not os.path.exists(
+            self.object_path(entry["sha256"])
+        ):
+            return None
+        return entry
+
+    def body(self, entry: dict) -> bytes:
+        with open(self.object_path(entry["sha256"]), "rb") as f:
+            return f.read()
+
+    def validators(self, entry: dict) -> dict:
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url: str, body: bytes, headers: dict, archive: str = None) -> dict:
+        digest = sha256(body)
+        path = self.object_path(digest)
+        if archive is None and not os.path.exists(path):
+            atomic_write(path, body)
+
+        entry = {
+            "url": url,
+            "sha256": digest,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_type": headers.get("Content-Type"),
+        }
+        if archive is not None:
+            entry["archive"] = archive
+        atomic_write(
+            self.meta_path(url), json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        )
+        return entry
@@ -0,0 +1,175 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+from archive import page_bytes, page_digest, store_page
+from http_cache import HttpCache
+from resilience import Host, call, max_limit
+
+# 装了 brotli 时 urllib3 的 ACCEPT_ENCODING 会带上 br，解压也由它负责
+headers = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36",
+    "Accept-Encoding": ACCEPT_ENCODING,
+}
+
+# 每个站点每秒允许的请求数和突发量，未列出的站点用默认值
+default_rate = (4.0, 8)
+host_rates = {
+    "movie.douban.com": (1.0, 10),
+}
+
+# 所有站点加起来同时在途的请求数上限，以及单个站点的并发上限（站点内再按 AIMD 自适应）
+max_inflight = 64
+host_limits = {
+    "movie.douban.com": 4,
+}
+
+pool_size = 32
+timeout = 30
+
+# 默认把响应存进共享缓存，重跑时发条件请求，304 直接读本地
+use_cache = True
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def pause(self, seconds: float) -> None:
+        # 服务器要求等待（Retry-After）时整个站点一起停，恢复后从空桶开始
+        with self.lock:
+            self.tokens = 0.0
+            self.updated = max(self.updated, time.monotonic() + seconds)
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.updated:
+                    wait = self.updated - now
+                else:
+                    self.tokens = min(
+                        self.capacity, self.tokens + (now - self.updated) * self.rate
+                    )
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class Client:
+    def __init__(
+        self,
+        rates: dict = None,
+        default: tuple = default_rate,
+        size: int = pool_size,
+        cache: HttpCache = None,
+        limits: dict = None,
+        budget: int = max_inflight,
+    ):
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        # 同一站点的连接保持复用，TCP/TLS 握手每个站点只做一次
+        adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.rates = dict(host_rates if rates is None else rates)
+        self.default = default
+        self.cache = cache
+        self.limits = dict(host_limits if limits is None else limits)
+        self.budget = threading.BoundedSemaphore(budget)
+        self.buckets = {}
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self.lock:
+            if host not in self.buckets:
+                rate, burst = self.rates.get(host, self.default)
+                self.buckets[host] = TokenBucket(rate, burst)
+            return self.buckets[host]
+
+    def host(self, host: str) -> Host:
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = Host(self.limits.get(host, max_limit))
+            return self.hosts[host]
+
+    def send(self, url: str, **kwargs) -> requests.Response:
+        # 限速、自适应并发、重试和熔断都在这里，返回最后一次的响应
+        hostname = urlsplit(url).hostname
+        return call(
+            self.host(hostname),
+            lambda: self.session.get(url, **kwargs),
+            self.bucket(hostname),
+            self.budget,
+        )
+
+    def get(self, url: str, archive: str = None, **kwargs) -> requests.Response:
+        # archive 是页面归档里的路径（tmp-xxx/xxx.html）：正文只存进归档，
+        # HTTP 缓存只记 ETag/Last-Modified，304 时从归档取回正文
+        kwargs.setdefault("timeout", timeout)
+        if self.cache is None or kwargs.get("stream"):
+            response = self.send(url, **kwargs)
+            if archive is not None and response.status_code == 200:
+                store_page(archive, response.content)
+            return response
+
+        entry = self.cache.lookup(url)
+        if (
+            entry is not None
+            and entry.get("archive")
+            and page_digest(entry["archive"]) != entry["sha256"]
+        ):
+            # 归档里的页面被删掉或换过内容，缓存的校验信息不能再用
+            entry = None
+        kwargs["headers"] = {
+            **self.cache.validators(entry),
+            **kwargs.get("headers", {}),
+        }
+        response = self.send(url, **kwargs)
+        response.from_cache = False
+
+        if response.status_code == 304 and entry is not None:
+            response.status_code = 200
+            if entry.get("archive"):
+                response._content = page_bytes(entry["archive"])
+            else:
+                response._content = self.cache.body(entry)
+            if entry.get("content_type"):
+                response.headers["Content-Type"] = entry["content_type"]
+            response.from_cache = True
+        elif response.status_code == 200:
+            if archive is not None:
+                store_page(archive, response.content)
+            self.cache.store(url, response.content, response.headers, archive)
+
+        return response
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> Client:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = Client(
+                cache=HttpCache() if use_cache else None, budget=max_inflight
+            )
+        return _client
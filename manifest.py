@@ -0,0 +1,77 @@
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from http_cache import atomic_write, sha256
+
+manifestdir = ".manifests"
+
+
+class Manifest:
+    # 记录每个数据集已经抓取并解析过的届次，以及当时页面内容的哈希
+    def __init__(self, dataset: str, root: str = manifestdir):
+        self.path = os.path.join(root, f"{dataset}.json")
+        self.editions = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.editions = json.load(f)["editions"]
+
+    def __contains__(self, key) -> bool:
+        return str(key) in self.editions
+
+    def changed(self, key, digest: str) -> bool:
+        entry = self.editions.get(str(key))
+        return entry is None or entry["sha256"] != digest
+
+    def mark(self, key, digest: str, rows: int) -> None:
+        self.editions[str(key)] = {
+            "sha256": digest,
+            "rows": rows,
+            "crawled_at": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    def reset(self) -> None:
+        self.editions = {}
+
+    def save(self) -> None:
+        data = {"editions": self.editions}
+        atomic_write(
+            self.path,
+            json.dumps(data, ensure_ascii=False, indent=2, sort_keys=True).encode(
+                "utf-8"
+            ),
+        )
+
+
+def digest_of(content) -> str:
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return sha256(content)
+
+
+def load_rows(path: str, sheet_name: str, schema=None) -> list:
+    # 给了 schema 就按它的字段顺序读成记录，和新解析的行类型一致
+    if not os.path.exists(path):
+        return []
+    df = pd.read_excel(path, sheet_name=sheet_name, keep_default_na=False)
+    if schema is None:
+        return df.to_dict("records")
+    return [
+        schema._make(row)
+        for row in df[list(schema._fields)].itertuples(index=False, name=None)
+    ]
+
+
+def field(row, key: str):
+    return row[key] if isinstance(row, dict) else getattr(row, key)
+
+
+def merge_rows(existing: list, fresh, key: str, reverse: bool = True) -> list:
+    # 用新解析的届次整体替换旧数据里同一届的行，届内顺序保持不变
+    fresh = list(fresh)
+    refreshed = {field(row, key) for row in fresh}
+    rows = [row for row in existing if field(row, key) not in refreshed] + fresh
+    rows.sort(key=lambda x: field(x, key), reverse=reverse)
+    return rows
@@ -0,0 +1,111 @@
+import concurrent.futures
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+
+from http_cache import atomic_write
+from http_client import get_client
+
+mediadir = "media"
+workers = 8
+chunk_size = 64 * 1024
+
+
+class MediaStore:
+    # objects/<哈希前两位>/<sha256><扩展名> 按内容存图片，相同图片只存一份
+    # partial/ 放没下完的文件，下次用 Range 续传；index.json 记录 URL 对应的文件
+    def __init__(self, root: str = mediadir):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        self.lock = threading.Lock()
+
+    def path(self, url: str) -> str:
+        name = self.index.get(url)
+        if name and os.path.exists(os.path.join(self.root, name)):
+            return os.path.join(self.root, name)
+        return None
+
+    def save_index(self) -> None:
+        with self.lock:
+            data = json.dumps(self.index, ensure_ascii=False, indent=0, sort_keys=True)
+        atomic_write(self.index_path, data.encode("utf-8"))
+
+    def fetch(self, url: str) -> str:
+        if self.path(url):
+            return self.index[url]
+
+        os.makedirs(os.path.join(self.root, "partial"), exist_ok=True)
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        part = os.path.join(self.root, "partial", f"{key}.part")
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with get_client().get(url, headers=headers, stream=True) as response:
+            if response.status_code == 416:
+                # 上次其实已经下完，只是还没来得及归档
+                pass
+            else:
+                response.raise_for_status()
+                # 服务器不支持 Range 时返回 200，只能从头再下
+                mode = "ab" if response.status_code == 206 else "wb"
+                with open(part, mode) as f:
+                    for chunk in response.iter_content(chunk_size):
+                        f.write(chunk)
+            content_type = response.headers.get("Content-Type", "")
+
+        digest = hashlib.sha256()
+        with open(part, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+
+        name = os.path.join(
+            "objects", digest[:2], digest + extension(url, content_type)
+        )
+        dest = os.path.join(self.root, name)
+        if os.path.exists(dest):
+            os.remove(part)
+        else:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.replace(part, dest)
+
+        with self.lock:
+            self.index[url] = name.replace(os.sep, "/")
+        return self.index[url]
+
+    def mirror(self, urls, workers: int = workers) -> dict:
+        unique = [url for url in dict.fromkeys(urls) if url and not self.path(url)]
+        print(f"Mirroring {len(unique)} new media files to {self.root}")
+
+        done = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.fetch, url): url for url in unique}
+            for future in concurrent.futures.as_completed(futures):
+                url = futures[future]
+                try:
+                    name = future.result()
+                    print(f"{url} -> {name}")
+                except (requests.RequestException, OSError) as e:
+                    print(f"\033[31mFailed to mirror {url} due to {e}\033[0m")
+                done += 1
+                if done % 100 == 0:
+                    self.save_index()
+
+        self.save_index()
+        return self.index
+
+
+def extension(url: str, content_type: str) -> str:
+    ext = os.path.splitext(urlsplit(url).path)[1].lower()
+    if ext in (".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif", ".svg"):
+        return ext
+    return mimetypes.guess_extension(content_type.split(";")[0].strip()) or ""
@@ -1,12 +1,27 @@
+import concurrent.futures
 import os
-from time import sleep
+import queue
 from selenium import webdriver
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    TimeoutException,
+    WebDriverException,
+)
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 from datetime import datetime
-from bs4 import BeautifulSoup
-import pandas as pd
-from openpyxl import load_workbook
+
+from executors import make_executor
+from archive import page_exists, read_page, store_page
+from database import Sink
+from exporters import open_writer
+from manifest import Manifest, digest_of, load_rows, merge_rows
+from parse_cache import cached_parse
+from parsers import make_soup
+from records import OscarsNomination, Table
 
 start_year = 1929
 base_url = "https://www.oscars.org/oscars/ceremonies/"
@@ -14,42 +29,142 @@ tmpdir = "tmp-oscars"
 
 filename = "oscars-of-all-years"
 
+# 增量模式只抓清单里没有的年份和最新一届，其余沿用已导出的数据
+incremental = True
+
+# 解析方式：thread、process 或 inline，解析是 CPU 密集的，默认用多进程
+parse_executor = "process"
+
+# 同时把结果 upsert 进 SQLite（crawlers.db），按届次、类别、顺序原地更新
+use_sqlite = False
+
+# 同时开的无头浏览器个数，以及等待页面渲染完成的最长秒数
+browsers = 4
+page_timeout = 30
+ready_selector = "div#tabSectionsContent"
+driver_path = os.environ.get("CHROMEDRIVER")
+
 
-def fetch_save_content():
+def make_driver():
     chrome_options = Options()
     chrome_options.add_argument("--headless")
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--no-sandbox")
 
-    driver_path = "D:\\DevTools\\browserdriver\\chromedriver-win64\\chromedriver.exe"
-    driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
+    # 没指定 chromedriver 时由 Selenium Manager 自动下载匹配的版本
+    service = Service(driver_path) if driver_path else Service()
+    return webdriver.Chrome(service=service, options=chrome_options)
 
-    os.makedirs(tmpdir, exist_ok=True)
-    current_year = datetime.now().year
-    while current_year >= start_year:
-        target_url = base_url + str(current_year)
+
+class SavedPageDriver:
+    # 不启动浏览器，直接返回 pagedir 里保存好的页面，用来离线重放和测试
+    def __init__(self, pagedir: str = tmpdir):
+        self.pagedir = pagedir
+        self.page_source = ""
+
+    def get(self, url: str) -> None:
+        year = url.rstrip("/").rsplit("/", 1)[-1]
+        path = os.path.join(self.pagedir, f"oscars-of-{year}.html")
+        self.page_source = read_content(path) if page_exists(path) else ""
+
+    def find_element(self, by, value):
+        if make_soup(self.page_source).select_one(value) is None:
+            raise NoSuchElementException(value)
+        return value
+
+    def quit(self) -> None:
+        pass
+
+
+def fetch_page(driver, year: int) -> bool:
+    target_url = base_url + str(year)
+    try:
         driver.get(target_url)
-        sleep(2)
-        with open(
-            f"./{tmpdir}/oscars-of-{current_year}.html", "w", encoding="utf-8"
-        ) as f:
-            f.write(driver.page_source)
-            print(f"Successfully fetch {target_url}")
-        current_year -= 1
-    driver.quit()
+        # 颁奖内容是脚本渲染的，等到 div#tabSectionsContent 出现就可以保存
+        WebDriverWait(driver, page_timeout).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, ready_selector))
+        )
+        content = driver.page_source
+    except TimeoutException:
+        print(f"\033[31mTimed out waiting for {target_url}\033[0m")
+        return False
+    # 浏览器崩溃之类的 WebDriverException 抛给调用方，由它换一个浏览器
+
+    store_page(page_path(year), content.encode("utf-8"))
+    print(f"Successfully fetch {target_url}")
+    return True
+
+
+def fetch_save_content(
+    years: list, browsers: int = browsers, driver_factory=make_driver
+) -> list:
+    os.makedirs(tmpdir, exist_ok=True)
+    years = sorted(years, reverse=True)
+
+    # 启动 N 个浏览器反复使用，每个线程从池子里借一个，抓完还回去
+    drivers = []
+    idle = queue.Queue()
+    try:
+        for _ in range(max(1, min(browsers, len(years)))):
+            driver = driver_factory()
+            drivers.append(driver)
+            idle.put(driver)
 
+        def fetch(year: int) -> bool:
+            driver = idle.get()
+            try:
+                return fetch_page(driver, year)
+            except WebDriverException as e:
+                # 只让这一年失败；浏览器多半已经崩了，换一个新的放回池子，
+                # 不然后面借到它的年份会跟着全部失败
+                print(f"\033[31mFailed to fetch {year} due to {e.msg}\033[0m")
+                driver = replace(driver)
+                return False
+            finally:
+                idle.put(driver)
 
-def parse_content(year: int) -> list:
-    with open(f"./{tmpdir}/oscars-of-{year}.html", "r", encoding="utf-8") as f:
-        content = f.read()
+        def replace(driver):
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+            try:
+                fresh = driver_factory()
+            except WebDriverException as e:
+                # 新浏览器也起不来就先放回旧的，下一个借到它的年份再试着换
+                print(f"\033[31mFailed to restart browser due to {e.msg}\033[0m")
+                return driver
+            drivers[drivers.index(driver)] = fresh
+            return fresh
 
-    soup = BeautifulSoup(content, "html.parser")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(drivers)) as pool:
+            fetched = list(pool.map(fetch, years))
+    finally:
+        for driver in drivers:
+            driver.quit()
+
+    return [year for year, ok in zip(years, fetched) if ok]
+
+
+def page_path(year: int) -> str:
+    return f"./{tmpdir}/oscars-of-{year}.html"
+
+
+def read_content(path: str) -> str:
+    # 页面存在 tmp-oscars/pages.pack 里，旧的 .html 文件也能读
+    return read_page(path)
+
+
+def parse_content(year: int, path: str = None, parser: str = None) -> Table:
+    content = read_content(path or page_path(year))
+
+    soup = make_soup(content, parser)
     content = soup.find("div", id="tabSectionsContent")
     categories = content.find("div", class_="field--name-field-award-categories")
     items = categories.find_all("div", class_="field__item", recursive=False)
 
-    data = []
-    edition = year - start_year + 1  # 第几届奥斯卡
+    data = Table(OscarsNomination)
+    edition = edition_of(year)  # 第几届奥斯卡
 
     print(f"\033[34mWelcome to the {year} - {edition}th Oscars!\033[0m")
 
@@ -75,14 +190,12 @@ def parse_content(year: int) -> list:
                 part2 = ""
 
             data.append(
-                {
-                    "year": year,
-                    "edition": edition,
-                    "category": category,
-                    "part1": part1,
-                    "part2": part2,
-                    "win": win,
-                }
+                year=year,
+                edition=edition,
+                category=category,
+                part1=part1,
+                part2=part2,
+                win=win,
             )
 
             print(
@@ -91,24 +204,60 @@ def parse_content(year: int) -> list:
     return data
 
 
-def save_to_excel(data: list, path: str) -> None:
-    df = pd.DataFrame(data)
-    df.to_excel(f"{path}.xlsx", sheet_name="oscars", index=False)
-
-    wb = load_workbook(f"{path}.xlsx")
+def save_to_excel(data, path: str) -> None:
+    with open_writer(f"{path}.xlsx") as writer:
+        writer.add_sheet("oscars", list(OscarsNomination._fields))
+        writer.write_rows("oscars", data)
 
-    wb.save(f"{path}.xlsx")
     print(f"Data saved to {os.getcwd()}\\{path}.xlsx")
 
 
-def main():
-    fetch_save_content()
+def edition_of(year: int) -> int:
+    return year - start_year + 1
+
+
+def parse_page(path: str, year: int) -> Table:
+    return cached_parse("oscars", read_content(path), parse_content, year, path)
+
+
+def main(incremental: bool = incremental, executor: str = parse_executor):
     current_year = datetime.now().year
-    data = []
-    while current_year >= start_year:
-        data.extend(parse_content(current_year))
-        current_year -= 1
+    years = list(range(current_year, start_year - 1, -1))
+
+    manifest = Manifest("oscars")
+    existing = []
+    if incremental and os.path.exists(f"{filename}.xlsx"):
+        existing = load_rows(f"{filename}.xlsx", "oscars", OscarsNomination)
+    else:
+        manifest.reset()
+
+    # 只有最新一届还会变化，历史年份抓过一次就不再重抓
+    fetch_years = [year for year in years if year not in manifest]
+    if current_year not in fetch_years:
+        fetch_years.insert(0, current_year)
+    fetch_years = fetch_save_content(fetch_years)
+
+    digests = {}
+    for year in fetch_years:
+        digest = digest_of(read_content(page_path(year)))
+        if not manifest.changed(year, digest):
+            print(f"{year} unchanged, skipped")
+            continue
+        digests[year] = digest
+
+    data = Table(OscarsNomination)
+    with make_executor(executor) as pool:
+        results = pool.map(parse_page, [page_path(y) for y in digests], digests)
+        for year, rows in zip(digests, results):
+            manifest.mark(year, digests[year], len(rows))
+            data.extend(rows)
+
+    data = merge_rows(existing, data, "year")
     save_to_excel(data, filename)
+    if use_sqlite:
+        with Sink() as sink:
+            sink.write(OscarsNomination, data)
+    manifest.save()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+import concurrent.futures
+import itertools
+import re
+
+window = 8
+
+# 明确的页码：?page=2、&paged=2 这样的参数，或 /2/、/page/2/ 这样单独一段路径
+page_query = re.compile(r"[?&](?:[\w-]*paged?|pg|p)=$", re.IGNORECASE)
+page_segment = re.compile(r"/(?:page/)?$", re.IGNORECASE)
+
+
+def numbered_pages(first_url: str, second_url: str):
+    # 从第二页的链接里找出页码 2，推出第 3、4、5... 页的链接；找不到规律就不预取
+    # 条目链接里碰巧带的 2（比如 /foo-2-123/）不算页码
+    base = first_url.split("?")[0]
+    for match in reversed(list(re.finditer(r"\d+", second_url))):
+        if match.group() != "2":
+            continue
+        prefix, suffix = second_url[: match.start()], second_url[match.end() :]
+        template = prefix + "{}" + suffix
+        if template.format(1) == first_url:
+            explicit = True
+        elif page_query.search(prefix):
+            explicit = prefix.split("?")[0] == base and suffix[:1] in ("", "&", "#")
+        elif page_segment.search(prefix):
+            listing = page_segment.sub("", prefix)
+            explicit = listing == base.rstrip("/") and suffix[:1] in ("", "/", "?", "#")
+        else:
+            explicit = False
+        if explicit:
+            return (template.format(n) for n in itertools.count(3))
+    return iter(())
+
+
+def finished(pending: list, next_link) -> bool:
+    # 已经预取回来的某页失败了或没有下一页，说明推测已经越过最后一页
+    for _, future in pending:
+        if future.done() and (
+            future.exception() is not None or not next_link(future.result())
+        ):
+            return True
+    return False
+
+
+def crawl_pages(
+    first_url: str, fetch, next_link, predict=numbered_pages, workers=window
+):
+    # fetch(url) 取一页，next_link(page) 给出下一页链接
+    # 第一页之后按 predict 推测的链接并发预取，再沿 next_link 逐页核对，
+    # 推测对不上或预取失败时取消剩下的预取，改回一页一页地抓
+    page = fetch(first_url)
+    yield page
+
+    expected = next_link(page)
+    if not expected:
+        return
+
+    guesses = itertools.chain([expected], predict(first_url, expected))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = [
+            (url, executor.submit(fetch, url))
+            for url in itertools.islice(guesses, workers)
+        ]
+        exhausted = False
+        while pending and expected:
+            url, future = pending.pop(0)
+            if url != expected or future.exception() is not None:
+                # 推测错了或预取失败，剩下的交给下面逐页抓
+                break
+            page = future.result()
+            yield page
+            expected = next_link(page)
+            exhausted = exhausted or finished(pending, next_link)
+            if not exhausted:
+                for url in itertools.islice(guesses, 1):
+                    pending.append((url, executor.submit(fetch, url)))
+
+        for _, future in pending:
+            future.cancel()
+
+    while expected:
+        page = fetch(expected)
+        yield page
+        expected = next_link(page)
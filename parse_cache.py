@@ -0,0 +1,54 @@
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+
+import parsers
+import records
+from http_cache import atomic_write
+
+# 解析结果按（页面内容、参数、解析代码版本）缓存，页面和代码都没变时直接读出，不再解析
+cachedir = ".parse-cache"
+use_parse_cache = True
+
+
+@functools.lru_cache(maxsize=None)
+def code_version(parse) -> str:
+    # 解析函数和记录 schema 的源码，再加上 BeautifulSoup 后端，任何一处改了缓存就失效
+    digest = hashlib.sha256()
+    digest.update(inspect.getsource(parse).encode("utf-8"))
+    digest.update(inspect.getsource(records).encode("utf-8"))
+    digest.update(parsers.backend.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def cache_key(parse, content, args: tuple) -> str:
+    digest = hashlib.sha256(code_version(parse).encode("utf-8"))
+    # 页面原文本身也可能是参数之一，单独按字节算，不进 repr
+    digest.update(repr([arg for arg in args if arg is not content]).encode("utf-8"))
+    digest.update(content.encode("utf-8") if isinstance(content, str) else content)
+    return digest.hexdigest()
+
+
+def cache_path(name: str, key: str) -> str:
+    return os.path.join(cachedir, name, key[:2], f"{key}.pickle")
+
+
+def cached_parse(name: str, content, parse, *args):
+    # 返回 parse(*args)；content 是页面原文，只用来算缓存键
+    if not use_parse_cache:
+        return parse(*args)
+
+    path = cache_path(name, cache_key(parse, content, args))
+    if os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            # 缓存文件坏了或 schema 类找不到了，重新解析
+            pass
+
+    result = parse(*args)
+    atomic_write(path, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+    return result
@@ -0,0 +1,55 @@
+import contextlib
+import io
+import re
+import sys
+
+import cannes
+import oscars
+from archive import glob_pages, read_page
+from parsers import check_parity
+
+
+def extract_cannes(path: str, parser: str) -> list:
+    year, kind = re.search(r"cannes-of-(\d+)-(\w+)\.html", path).groups()
+    year = int(year)
+    content = read_page(path)
+
+    extract = cannes.parse_awards if kind == "awards" else cannes.parse_selection
+    with contextlib.redirect_stdout(io.StringIO()):
+        return list(extract(year, year - cannes.start_year + 1, content, parser))
+
+
+def extract_oscars(path: str, parser: str) -> list:
+    year = int(re.search(r"oscars-of-(\d+)\.html", path).group(1))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return list(oscars.parse_content(year, path, parser))
+
+
+def main(parsers: tuple = ("html.parser", "lxml")) -> int:
+    datasets = [
+        ("cannes", extract_cannes, f"./{cannes.tmpdir}/cannes-of-*.html"),
+        ("oscars", extract_oscars, f"./{oscars.tmpdir}/oscars-of-*.html"),
+    ]
+
+    failed = 0
+    for name, extract, pattern in datasets:
+        pages = glob_pages(pattern)
+        mismatches = check_parity(extract, pages, parsers)
+        for page, parser, expected, actual in mismatches:
+            print(
+                f"\033[31m{page}: {parser} extracted {len(actual)} records, "
+                f"{parsers[0]} extracted {len(expected)}\033[0m"
+            )
+            for want, got in zip(expected, actual):
+                if want != got:
+                    print(f"  {parsers[0]}: {want}\n  {parser}: {got}")
+                    break
+        status = "\033[32mOK\033[0m" if not mismatches else "\033[31mFAILED\033[0m"
+        print(f"{name}: {len(pages)} pages, {len(mismatches)} mismatches {status}")
+        failed += len(mismatches)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(tuple(sys.argv[1:]) or ("html.parser", "lxml")))
@@ -0,0 +1,22 @@
+import os
+
+from bs4 import BeautifulSoup
+
+# lxml 是 C 实现的，建树比 html.parser 快好几倍；切换前先跑 parser-parity.py 核对结果
+backend = os.environ.get("CRAWLER_PARSER", "html.parser")
+
+
+def make_soup(content, parser: str = None) -> BeautifulSoup:
+    return BeautifulSoup(content, parser or backend)
+
+
+def check_parity(extract, pages: list, parsers: tuple = ("html.parser", "lxml")):
+    # extract(page, parser) 返回一页的记录，逐页比较各解析器的结果
+    mismatches = []
+    for page in pages:
+        expected = extract(page, parsers[0])
+        for parser in parsers[1:]:
+            actual = extract(page, parser)
+            if actual != expected:
+                mismatches.append((page, parser, expected, actual))
+    return mismatches
@@ -0,0 +1,212 @@
+from array import array
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+# 各数据集一行记录的字段，顺序就是导出表格的列顺序
+class GrammyNomination(NamedTuple):
+    year: int
+    edition: int
+    award: str
+    part1: str
+    part2: str
+    part3: str
+    win: bool
+    order: int
+    avatar: str
+
+
+class CannesSelection(NamedTuple):
+    year: int
+    edition: int
+    title: str
+    part1: str
+    part2: str
+    cannes_link: str
+    img: str
+
+
+class CannesAward(NamedTuple):
+    year: int
+    edition: int
+    title: str
+    part1: str
+    part2: str
+    award: str
+    cannes_link: str
+    img: str
+
+
+class OscarsNomination(NamedTuple):
+    year: int
+    edition: int
+    category: str
+    part1: str
+    part2: str
+    win: bool
+
+
+class Album2003(NamedTuple):
+    rank: str
+    cover: str
+    artist: str
+    album: str
+    caption: str
+    company: str
+    year: str
+    description: str
+
+
+class Album2023(NamedTuple):
+    rank: str
+    cover: str
+    artist: str
+    album: str
+    company: str
+    year: str
+    description: str
+
+
+# 每个 schema 里重复很多的字符串列，按字典编码存：一份字符串加整数码
+categoricals = {
+    GrammyNomination: ("award",),
+    CannesSelection: ("title",),
+    CannesAward: ("title", "award"),
+    OscarsNomination: ("category",),
+    Album2003: ("company", "year"),
+    Album2023: ("company", "year"),
+}
+
+typecodes = {int: "q", float: "d", bool: "b"}
+dtypes = {"q": np.int64, "d": np.float64, "b": np.bool_, "i": np.int32}
+# 数值列里出现 None 时改用 list 存，导出成 pandas 的可空类型
+nullable = {int: "Int64", float: "Float64", bool: "boolean"}
+
+
+class Table:
+    # 按列追加：数值列放 array.array，类别列放 int32 码和字典，其余字符串放 list
+    # 一行不再是一个 dict，重复的届次、奖项名也只存一份
+    # to_frame()/to_arrow() 直接借用 array 的内存，导出之后表就只读，不能再追加
+    def __init__(self, schema, categorical: tuple = None):
+        self.schema = schema
+        self.fields = schema._fields
+        if categorical is None:
+            categorical = categoricals.get(schema, ())
+        self.dictionaries = {name: {} for name in categorical}
+        self.columns = {}
+        for name in self.fields:
+            if name in self.dictionaries:
+                self.columns[name] = array("i")
+            elif schema.__annotations__[name] in typecodes:
+                self.columns[name] = array(typecodes[schema.__annotations__[name]])
+            else:
+                self.columns[name] = []
+        self.length = 0
+        self.exported = False
+
+    @classmethod
+    def from_rows(cls, schema, rows, categorical: tuple = None):
+        table = cls(schema, categorical)
+        table.extend(rows)
+        return table
+
+    def append(self, *values, **fields) -> None:
+        if self.exported:
+            raise ValueError(
+                f"{self.schema.__name__} table is read-only after to_frame()/to_arrow()"
+            )
+        record = self.schema(*values, **fields)
+        for name, value in zip(self.fields, record):
+            column = self.columns[name]
+            dictionary = self.dictionaries.get(name)
+            if dictionary is not None:
+                # 缺失值记成 -1，和 pandas 缺失类别的码一致
+                value = (
+                    -1
+                    if value is None
+                    else dictionary.setdefault(value, len(dictionary))
+                )
+            elif value is None and isinstance(column, array):
+                column = self.columns[name] = self.column(name)
+            column.append(value)
+        self.length += 1
+
+    def extend(self, rows) -> None:
+        for row in rows:
+            self.append(*row)
+
+    def column(self, name: str) -> list:
+        values = self.columns[name]
+        if name in self.dictionaries:
+            categories = list(self.dictionaries[name])
+            return [categories[code] if code >= 0 else None for code in values]
+        if isinstance(values, array) and values.typecode == "b":
+            return [bool(value) for value in values]
+        return list(values)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self):
+        return map(self.schema._make, zip(*(self.column(f) for f in self.fields)))
+
+    def to_frame(self) -> pd.DataFrame:
+        # 数值列和类别码直接用 array 的内存，不复制
+        self.exported = True
+        data = {}
+        for name in self.fields:
+            values = self.columns[name]
+            if name in self.dictionaries:
+                data[name] = pd.Categorical.from_codes(
+                    np.frombuffer(values, dtype=np.int32),
+                    categories=list(self.dictionaries[name]),
+                )
+            elif isinstance(values, array):
+                data[name] = np.frombuffer(values, dtype=dtypes[values.typecode])
+            elif self.schema.__annotations__[name] in nullable:
+                data[name] = pd.array(
+                    values, dtype=nullable[self.schema.__annotations__[name]]
+                )
+            else:
+                data[name] = values
+        return pd.DataFrame(data, columns=list(self.fields), copy=False)
+
+    def to_arrow(self):
+        import pyarrow as pa
+
+        self.exported = True
+        arrowtypes = {int: pa.int64(), float: pa.float64(), bool: pa.bool_()}
+        arrays = []
+        for name in self.fields:
+            values = self.columns[name]
+            if name in self.dictionaries:
+                codes = np.frombuffer(values, dtype=np.int32)
+                if (codes < 0).any():
+                    indices = pa.array(codes, mask=codes < 0)
+                else:
+                    indices = pa.Array.from_buffers(
+                        pa.int32(), len(values), [None, pa.py_buffer(values)]
+                    )
+                arrays.append(
+                    pa.DictionaryArray.from_arrays(
+                        indices, pa.array(list(self.dictionaries[name]))
+                    )
+                )
+            elif isinstance(values, array) and values.typecode == "b":
+                # Arrow 的布尔列按位存，只能转换一次
+                arrays.append(pa.array(np.frombuffer(values, dtype=np.bool_)))
+            elif isinstance(values, array):
+                dtype = pa.from_numpy_dtype(dtypes[values.typecode])
+                arrays.append(
+                    pa.Array.from_buffers(
+                        dtype, len(values), [None, pa.py_buffer(values)]
+                    )
+                )
+            else:
+                annotation = self.schema.__annotations__[name]
+                arrays.append(
+                    pa.array(values, type=arrowtypes.get(annotation, pa.string()))
+                )
+        return pa.Table.from_arrays(arrays, names=list(self.fields))
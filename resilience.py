@@ -0,0 +1,194 @@
+import email.utils
+import random
+import threading
+import time
+
+import requests
+
+# 失败重试：指数退避加随机抖动，429/503 带 Retry-After 时按服务器给的时间等
+retries = 4
+base_delay = 1.0
+max_delay = 60.0
+retry_statuses = {429, 500, 502, 503, 504}
+
+# 同一站点连续失败这么多次就熔断，冷却期内的请求直接失败，冷却后放一个请求试探
+failure_threshold = 5
+cooldown = 60.0
+
+# 每个站点同时在途的请求数按 AIMD 调整：成功且延迟正常时慢慢加，
+# 出错或延迟超过基线的 latency_factor 倍时减半
+initial_limit = 4
+min_limit = 1
+max_limit = 32
+latency_factor = 2.0
+
+
+class CircuitOpen(requests.ConnectionError):
+    pass
+
+
+def backoff(attempt: int, retry_after: float = None) -> float:
+    if retry_after is not None:
+        return min(max_delay, retry_after)
+    # full jitter：在 0 到指数上限之间随机取，避免所有线程同一时刻一起重试
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
+
+
+def retry_after(response: requests.Response) -> float:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = failure_threshold, cooldown: float = cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened is None:
+                return True
+            if self.probing or time.monotonic() - self.opened < self.cooldown:
+                return False
+            # 半开：冷却结束后只放行一个试探请求
+            self.probing = True
+            return True
+
+    def success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+            self.probing = False
+
+    def failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened = time.monotonic()
+            self.probing = False
+
+
+class AdaptiveLimit:
+    def __init__(
+        self,
+        initial: int = initial_limit,
+        minimum: int = min_limit,
+        maximum: int = max_limit,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.inflight = 0
+        self.baseline = None
+        self.decreased = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self.condition:
+            while self.inflight >= int(self.limit):
+                self.condition.wait()
+            self.inflight += 1
+
+    def release(self, latency: float, ok: bool) -> None:
+        with self.condition:
+            self.inflight -= 1
+            if ok and self.baseline is None:
+                self.baseline = latency
+            elif ok:
+                # 基线取近期延迟的下沿，偶尔的慢请求不会把它抬高
+                self.baseline = min(latency, 0.9 * self.baseline + 0.1 * latency)
+
+            congested = not ok or latency > latency_factor * self.baseline
+            now = time.monotonic()
+            if congested:
+                # 一个延迟周期内只减一次，同一波失败不会把并发一路砍到底
+                if now - self.decreased > (self.baseline or 1.0):
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.decreased = now
+            else:
+                # 每成功一轮（limit 个请求）并发加一
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+
+class Host:
+    # 一个站点的熔断器和自适应并发，maximum 是该站点并发的上限
+    def __init__(self, maximum: int = max_limit):
+        self.breaker = CircuitBreaker()
+        self.limit = AdaptiveLimit(
+            initial=min(initial_limit, maximum), maximum=maximum
+        )
+
+
+def call(host: Host, send, bucket=None, budget=None, attempts: int = retries + 1):
+    # send() 发出一次请求；bucket 是该站点的限速令牌桶，Retry-After 时让它整体暂停
+    # budget 是所有站点共享的在途请求上限（信号量）
+    for attempt in range(attempts):
+        if not host.breaker.allow():
+            raise CircuitOpen(f"Circuit open after {host.breaker.failures} failures")
+
+        if bucket is not None:
+            bucket.acquire()
+        host.limit.acquire()
+        if budget is not None:
+            budget.acquire()
+        started = time.monotonic()
+        response = None
+        try:
+            response = send()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        except BaseException:
+            # 其他异常不重试，但也算一次失败，半开的试探请求不会一直挂着
+            host.breaker.failure()
+            raise
+        finally:
+            # 不管 send() 怎么结束，并发名额和全局预算都要还回去
+            if budget is not None:
+                budget.release()
+            ok = response is not None and response.status_code not in retry_statuses
+            host.limit.release(time.monotonic() - started, ok=ok)
+
+        if response is None:
+            host.breaker.failure()
+            if attempt == attempts - 1:
+                raise error
+            delay = backoff(attempt)
+            print(
+                f"\033[33mRetry {attempt + 1}/{attempts - 1} in {delay:.1f}s: {error}\033[0m"
+            )
+            time.sleep(delay)
+            continue
+
+        if ok:
+            host.breaker.success()
+            return response
+
+        host.breaker.failure()
+        if attempt == attempts - 1:
+            return response
+
+        wait = retry_after(response) if response.status_code in (429, 503) else None
+        delay = backoff(attempt, wait)
+        if wait is not None and bucket is not None:
+            bucket.pause(delay)
+        print(
+            f"\033[33mRetry {attempt + 1}/{attempts - 1} in {delay:.1f}s: "
+            f"{response.status_code} {response.url}\033[0m"
+        )
+        response.close()
+        time.sleep(delay)
@@ -0,0 +1,106 @@
+import argparse
+import concurrent.futures
+import importlib.util
+import os
+import sys
+import time
+import traceback
+
+import http_client
+
+# 用法：python runner.py [grammy cannes ...] [--budget 64] [--limit movie.douban.com=4]
+# 不写名字就全部一起跑；所有爬虫在同一个进程里共用连接池、缓存和限速
+crawlers = {
+    "grammy": "grammy-awards.py",
+    "cannes": "cannes.py",
+    "oscars": "oscars.py",
+    "douban": "douban-movie-top250.py",
+    "rollingstone-2003": "rollingstone-best-albums-of-all-time-2003.py",
+    "rollingstone-2023": "rollingstone-best-albums-of-all-time-2023.py",
+}
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+
+def load(name: str):
+    # 文件名带连字符，不能直接 import；按文件名注册进 sys.modules，
+    # 进程池在子进程里反序列化解析函数时才找得到
+    path = os.path.join(here, crawlers[name])
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def run(name: str) -> float:
+    started = time.monotonic()
+    load(name).main()
+    return time.monotonic() - started
+
+
+def run_all(names: list) -> dict:
+    # 每个爬虫一个线程，站点之间并行，总耗时取决于最慢的那个站点
+    failures = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(names)) as executor:
+        futures = {executor.submit(run, name): name for name in names}
+        for future in concurrent.futures.as_completed(futures):
+            name = futures[future]
+            try:
+                elapsed = future.result()
+                print(f"\033[32m{name} finished in {elapsed:.1f}s\033[0m")
+            except Exception as e:
+                traceback.print_exc()
+                print(f"\033[31m{name} failed due to {e}\033[0m")
+                failures[name] = e
+    return failures
+
+
+def parse_limit(value: str) -> tuple:
+    host, _, limit = value.partition("=")
+    if not host or not limit.isdigit() or int(limit) < 1:
+        raise argparse.ArgumentTypeError(f"expected host=N, got {value!r}")
+    return host, int(limit)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Run crawlers concurrently")
+    parser.add_argument("names", nargs="*", help=f"any of {', '.join(crawlers)}")
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=http_client.max_inflight,
+        help="max in-flight requests across all sites",
+    )
+    parser.add_argument(
+        "--limit",
+        type=parse_limit,
+        action="append",
+        default=[],
+        metavar="HOST=N",
+        help="max in-flight requests for one site",
+    )
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in crawlers]
+    if unknown:
+        parser.error(f"unknown crawlers {unknown}, expected some of {list(crawlers)}")
+
+    # 共享客户端第一次创建前设置好，之后所有爬虫都用同一个
+    http_client.max_inflight = args.budget
+    http_client.host_limits.update(args.limit)
+
+    names = list(dict.fromkeys(args.names)) or list(crawlers)
+    started = time.monotonic()
+    failures = run_all(names)
+    print(
+        f"{len(names) - len(failures)}/{len(names)} crawlers finished "
+        f"in {time.monotonic() - started:.1f}s"
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+import archive
+import oscars
+
+page = '<div id="tabSectionsContent"><p>Ceremony {year}</p></div>'
+
+
+@pytest.fixture
+def saved(tmp_path, monkeypatch):
+    # 保存好的页面放在 saved/ 里，抓到的页面写进 tmp_path 下的 tmp-oscars 归档
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(archive, "_archives", {})
+    monkeypatch.setattr(oscars, "page_timeout", 0.2)
+    pagedir = tmp_path / "saved"
+    pagedir.mkdir()
+    for year in (2020, 2021, 2022, 2023):
+        (pagedir / f"oscars-of-{year}.html").write_text(page.format(year=year))
+    return str(pagedir)
+
+
+def test_fetch_saved_pages(saved):
+    fetched = oscars.fetch_save_content(
+        [2020, 2021, 2022, 2023, 2019],
+        browsers=2,
+        driver_factory=lambda: oscars.SavedPageDriver(saved),
+    )
+    # 2019 没有保存的页面，等不到 div#tabSectionsContent 超时
+    assert fetched == [2023, 2022, 2021, 2020]
+    assert "Ceremony 2021" in oscars.read_content(oscars.page_path(2021))
+    assert not archive.page_exists(oscars.page_path(2019))
+
+
+def test_crashed_browser_is_replaced(saved):
+    started = []
+    quit = []
+
+    class CrashingDriver(oscars.SavedPageDriver):
+        def __init__(self):
+            super().__init__(saved)
+            self.crashed = not started
+            started.append(self)
+
+        def get(self, url: str) -> None:
+            if self.crashed:
+                raise WebDriverException("chrome not reachable")
+            super().get(url)
+
+        def quit(self) -> None:
+            quit.append(self)
+
+    fetched = oscars.fetch_save_content(
+        [2020, 2021, 2022, 2023], browsers=1, driver_factory=CrashingDriver
+    )
+    # 只有崩溃时正在抓的那一年失败，换上的新浏览器把剩下的年份抓完
+    assert fetched == [2022, 2021, 2020]
+    assert len(started) == 2
+    assert started[0] in quit and started[1] in quit
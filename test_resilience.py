@@ -0,0 +1,111 @@
+import io
+
+import pytest
+import requests
+
+import resilience
+
+
+def make_response(status: int, headers: dict = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response.url = "http://example.com/"
+    response.raw = io.BytesIO()
+    return response
+
+
+class FakeBucket:
+    def __init__(self):
+        self.acquired = 0
+        self.paused = []
+
+    def acquire(self) -> None:
+        self.acquired += 1
+
+    def pause(self, seconds: float) -> None:
+        self.paused.append(seconds)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(resilience.time, "sleep", slept.append)
+    monkeypatch.setattr(resilience, "base_delay", 0.01)
+    return slept
+
+
+def test_success_returns_response(sleeps):
+    host = resilience.Host()
+    response = make_response(200)
+    assert resilience.call(host, lambda: response) is response
+    assert host.limit.inflight == 0
+    assert host.breaker.failures == 0
+    assert sleeps == []
+
+
+def test_non_transient_error_releases_slot(sleeps):
+    host = resilience.Host(maximum=2)
+    budget = resilience.threading.BoundedSemaphore(1)
+
+    def send():
+        raise requests.exceptions.ChunkedEncodingError("truncated")
+
+    # 名额泄漏的话，第三次 acquire 就会永远卡住
+    for _ in range(host.limit.maximum + 1):
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            resilience.call(host, send, budget=budget)
+    assert host.limit.inflight == 0
+    assert budget.acquire(blocking=False)
+    assert sleeps == []
+
+
+def test_failed_probe_reopens_circuit(sleeps, monkeypatch):
+    host = resilience.Host()
+    host.breaker.opened = resilience.time.monotonic() - host.breaker.cooldown - 1
+
+    def send():
+        raise requests.TooManyRedirects("loop")
+
+    with pytest.raises(requests.TooManyRedirects):
+        resilience.call(host, send)
+    assert not host.breaker.probing
+    with pytest.raises(resilience.CircuitOpen):
+        resilience.call(host, send)
+
+    # 冷却结束后能再放一个试探请求，成功就关闭熔断
+    monkeypatch.setattr(
+        resilience.time,
+        "monotonic",
+        lambda: host.breaker.opened + host.breaker.cooldown + 1,
+    )
+    response = make_response(200)
+    assert resilience.call(host, lambda: response) is response
+    assert host.breaker.opened is None
+
+
+def test_retry_after_pauses_bucket(sleeps):
+    host = resilience.Host()
+    bucket = FakeBucket()
+    responses = [make_response(429, {"Retry-After": "7"}), make_response(200)]
+    response = resilience.call(host, lambda: responses.pop(0), bucket=bucket)
+    assert response.status_code == 200
+    assert sleeps == [7.0]
+    assert bucket.paused == [7.0]
+    assert bucket.acquired == 2
+    assert host.limit.inflight == 0
+
+
+def test_connection_errors_retry_then_raise(sleeps):
+    host = resilience.Host()
+    calls = []
+
+    def send():
+        calls.append(1)
+        raise requests.ConnectionError("refused")
+
+    with pytest.raises(requests.ConnectionError):
+        resilience.call(host, send, attempts=3)
+    assert len(calls) == 3
+    assert len(sleeps) == 2
+    assert host.limit.inflight == 0
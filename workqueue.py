@@ -0,0 +1,267 @@
+import argparse
+import contextlib
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from database import Sink, dbpath
+from runner import load
+
+# 共享的任务队列文件，每个单元是 (数据集, 年份/届次)
+# SQLite 模式只保证同一台机器上的多个 worker 安全；要跨机器，队列文件所在的共享目录
+# 必须支持文件字节范围锁（NFSv4 或开了锁的 SMB，且不能关掉 oplocks/锁缓存），
+# 否则 BEGIN IMMEDIATE 拿不到真正的互斥，两台机器可能领到同一个单元
+queuepath = "queue.db"
+
+# 领走的单元在 lease 秒内没续约就视为 worker 掉线，别的 worker 可以重新领
+lease = 120
+heartbeat = 30
+max_attempts = 5
+idle_wait = 5
+
+
+class WorkQueue:
+    def __init__(self, path: str = queuepath):
+        self.path = path
+        with self.connect() as connection:
+            # WAL 的共享内存索引不能跨机器，用回滚日志，锁完全走文件锁
+            connection.execute("PRAGMA journal_mode=DELETE")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS units ("
+                "dataset TEXT, unit TEXT, state TEXT DEFAULT 'pending', "
+                "worker TEXT, lease_until REAL DEFAULT 0, attempts INTEGER DEFAULT 0, "
+                "error TEXT, PRIMARY KEY (dataset, unit))"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS units_state ON units (state, lease_until)"
+            )
+
+    def connect(self):
+        # 每次操作单独连接（autocommit），心跳线程和工作线程互不干扰
+        return contextlib.closing(
+            sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        )
+
+    def put(self, dataset: str, units) -> int:
+        with self.connect() as connection:
+            cursor = connection.executemany(
+                "INSERT OR IGNORE INTO units (dataset, unit) VALUES (?, ?)",
+                [(dataset, str(unit)) for unit in units],
+            )
+            return cursor.rowcount
+
+    def claim(self, worker: str, datasets: list = None) -> tuple:
+        # BEGIN IMMEDIATE 先拿写锁，两个 worker 不会领到同一个单元
+        now = time.time()
+        where = "(state = 'pending' OR (state = 'leased' AND lease_until < ?))"
+        params = [now]
+        if datasets:
+            where += f" AND dataset IN ({', '.join('?' * len(datasets))})"
+            params += list(datasets)
+
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                f"SELECT dataset, unit, attempts FROM units WHERE {where} "
+                "ORDER BY attempts, dataset, unit LIMIT 1",
+                params,
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            dataset, unit, attempts = row
+            if attempts >= max_attempts:
+                # 租约过期的次数也算一次尝试，超过上限就不再发出去
+                connection.execute(
+                    "UPDATE units SET state = 'failed' WHERE dataset = ? AND unit = ?",
+                    (dataset, unit),
+                )
+                connection.execute("COMMIT")
+                return self.claim(worker, datasets)
+            connection.execute(
+                "UPDATE units SET state = 'leased', worker = ?, lease_until = ?, "
+                "attempts = attempts + 1 WHERE dataset = ? AND unit = ?",
+                (worker, now + lease, dataset, unit),
+            )
+            connection.execute("COMMIT")
+            return dataset, unit
+
+    def _update(self, sql: str, params: tuple) -> bool:
+        with self.connect() as connection:
+            return connection.execute(sql, params).rowcount == 1
+
+    def renew(self, dataset: str, unit: str, worker: str) -> bool:
+        # 只有还持有租约的 worker 能续约
+        return self._update(
+            "UPDATE units SET lease_until = ? "
+            "WHERE dataset = ? AND unit = ? AND worker = ? AND state = 'leased'",
+            (time.time() + lease, dataset, unit, worker),
+        )
+
+    def complete(self, dataset: str, unit: str, worker: str) -> bool:
+        return self._update(
+            "UPDATE units SET state = 'done', error = NULL "
+            "WHERE dataset = ? AND unit = ? AND worker = ?",
+            (dataset, unit, worker),
+        )
+
+    def fail(self, dataset: str, unit: str, worker: str, error: str) -> bool:
+        # 失败的单元放回队列，attempts 到上限后标记为 failed
+        return self._update(
+            "UPDATE units SET state = CASE WHEN attempts >= ? THEN 'failed' "
+            "ELSE 'pending' END, error = ?, lease_until = 0 "
+            "WHERE dataset = ? AND unit = ? AND worker = ?",
+            (max_attempts, error, dataset, unit, worker),
+        )
+
+    def stats(self) -> list:
+        with self.connect() as connection:
+            return connection.execute(
+                "SELECT dataset, state, COUNT(*) FROM units "
+                "GROUP BY dataset, state ORDER BY dataset, state"
+            ).fetchall()
+
+
+# 每个数据集：seed() 列出所有单元，process(unit) 抓取解析一个单元，
+# 返回 [(schema, rows, 届次列表), ...] 交给中央的 SQLite sink，按届整体替换
+def seed_cannes() -> list:
+    cannes = load("cannes")
+    return [
+        year
+        for year in range(cannes.end_year, cannes.start_year - 1, -1)
+        if year not in cannes.except_years
+    ]
+
+
+def process_cannes(unit: str) -> list:
+    cannes = load("cannes")
+    year = int(unit)
+    os.makedirs(cannes.tmpdir, exist_ok=True)
+    results = []
+    for kind in cannes.page_urls:
+        cannes.fetch_page(year, kind)
+        rows = cannes.parse_page(cannes.page_path(year, kind), kind, year)
+        results.append((rows.schema, rows, [cannes.edition_of(year)]))
+    return results
+
+
+def seed_oscars() -> list:
+    oscars = load("oscars")
+    return list(range(datetime.now().year, oscars.start_year - 1, -1))
+
+
+def process_oscars(unit: str) -> list:
+    oscars = load("oscars")
+    year = int(unit)
+    if not oscars.fetch_save_content([year], browsers=1):
+        raise RuntimeError(f"Failed to fetch Oscars {year}")
+    rows = oscars.parse_page(oscars.page_path(year), year)
+    return [(rows.schema, rows, [oscars.edition_of(year)])]
+
+
+def seed_grammy() -> list:
+    grammy = load("grammy")
+    return grammy.edition_links(grammy.fetch_and_parse(grammy.target))
+
+
+def process_grammy(unit: str) -> list:
+    grammy = load("grammy")
+    rows = grammy.parse_data(grammy.fetch_edition(unit))
+    return [(rows.schema, rows, [grammy.get_th_order(unit[len(grammy.domain) :])])]
+
+
+datasets = {
+    "cannes": (seed_cannes, process_cannes),
+    "oscars": (seed_oscars, process_oscars),
+    "grammy": (seed_grammy, process_grammy),
+}
+
+
+def seed(queue: WorkQueue, names: list) -> None:
+    for name in names:
+        units = datasets[name][0]()
+        added = queue.put(name, units)
+        print(f"{name}: {added} new units queued ({len(units)} total)")
+
+
+def work(
+    queue: WorkQueue,
+    sink_path: str,
+    names: list = None,
+    worker: str = None,
+    once: bool = False,
+) -> int:
+    # 不断领单元直到队列里没有可领的；once=False 时空了也继续等新单元
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    done = 0
+    with Sink(sink_path) as sink:
+        while True:
+            claimed = queue.claim(worker, names)
+            if claimed is None:
+                if once:
+                    return done
+                time.sleep(idle_wait)
+                continue
+
+            dataset, unit = claimed
+            print(f"\033[34m{worker} claimed {dataset} {unit}\033[0m")
+            stop = threading.Event()
+
+            def renew() -> None:
+                while not stop.wait(heartbeat):
+                    if not queue.renew(dataset, unit, worker):
+                        print(f"\033[33mLost lease on {dataset} {unit}\033[0m")
+                        return
+
+            beating = threading.Thread(target=renew, daemon=True)
+            beating.start()
+            try:
+                results = datasets[dataset][1](unit)
+                # 按届整体替换是幂等的，租约过期后被别人重做也不会写出重复行
+                for schema, rows, editions in results:
+                    sink.write(schema, rows, editions)
+                queue.complete(dataset, unit, worker)
+                done += 1
+            except Exception as e:
+                traceback.print_exc()
+                print(f"\033[31m{dataset} {unit} failed due to {e}\033[0m")
+                queue.fail(dataset, unit, worker, repr(e))
+            finally:
+                stop.set()
+                beating.join()
+
+
+def main(argv: list = None) -> int:
+    # python workqueue.py seed cannes oscars grammy
+    # python workqueue.py work [cannes ...] [--once]   （每台机器上起一个或多个）
+    # python workqueue.py status
+    parser = argparse.ArgumentParser(description="Crawl through a shared work queue")
+    parser.add_argument("command", choices=("seed", "work", "status"))
+    parser.add_argument("names", nargs="*", help=f"any of {', '.join(datasets)}")
+    parser.add_argument("--queue", default=queuepath, help="shared queue database")
+    parser.add_argument("--db", default=dbpath, help="central result sink")
+    parser.add_argument("--worker", help="worker id, defaults to host-pid")
+    parser.add_argument("--once", action="store_true", help="exit when queue is empty")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in datasets]
+    if unknown:
+        parser.error(f"unknown datasets {unknown}, expected some of {list(datasets)}")
+
+    queue = WorkQueue(args.queue)
+    if args.command == "seed":
+        seed(queue, args.names or list(datasets))
+    elif args.command == "work":
+        done = work(queue, args.db, args.names, args.worker, args.once)
+        print(f"{done} units done")
+    for dataset, state, count in queue.stats():
+        print(f"{dataset} {state}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())